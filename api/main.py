@@ -1,5 +1,8 @@
 import os
-from typing import List, Optional, Any, Dict
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Callable, List, Optional, Any, Dict
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,12 +10,17 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
 from logger import global_logger as log
-from src.data_ingestion import ChatIngestor
+from src.data_ingestion import ChatIngestor, list_indexed_documents
 from utils.doc_ops import FastApiFileHandler
+from utils.file_IO import generate_session_id
 from src.retrieval import ConversationalRag
-
-
-app= FastAPI(title="Document Chatting System", version="0.1")
+from utils.model_loader import get_model_loader, router_stats
+from utils.index_cache import index_cache
+from utils.storage_manager import SessionStorageManager
+from utils.parse_cache import get_parse_cache
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.metadata_filter import normalize_filters
+from model.models import BatchQueryRequest
 
 
 
@@ -20,6 +28,90 @@ FAISS_BASE= os.getenv("FAISS_BASE", "faiss_index")
 UPLOAD_BASE= os.getenv("UPLOAD_BASE", "data")
 FAISS_INDEX_NAME= os.getenv("FAISS_INDEX_NAME", "index")
 
+# Startup warm-up: build shared clients (and optionally load hot session indexes) once per worker
+WARMUP_ON_STARTUP= os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+WARMUP_BLOCKING= os.getenv("WARMUP_BLOCKING", "false").lower() == "true"
+PRELOAD_SESSIONS= [s.strip() for s in os.getenv("PRELOAD_SESSIONS", "").split(",") if s.strip()]
+
+# Session storage lifecycle (0 disables TTL / quota eviction)
+storage= SessionStorageManager(
+    upload_base=UPLOAD_BASE,
+    faiss_base=FAISS_BASE,
+    ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "0")),
+    max_bytes=int(os.getenv("STORAGE_QUOTA_BYTES", "0")),
+    min_idle_seconds=float(os.getenv("SESSION_MIN_IDLE_SECONDS", "300")),
+    delete_uploads_after_index=os.getenv("DELETE_UPLOADS_AFTER_INDEX", "false").lower() == "true",
+)
+STORAGE_SWEEP_INTERVAL= float(os.getenv("STORAGE_SWEEP_INTERVAL", "300"))
+
+# Batch query limits
+MAX_BATCH_QUESTIONS= int(os.getenv("MAX_BATCH_QUESTIONS", "500"))
+MAX_BATCH_CONCURRENCY= int(os.getenv("MAX_BATCH_CONCURRENCY", "8"))
+
+# Admission control per uvicorn worker: concurrent requests, bounded wait queue and optional
+# per-session cap for ingestion (index/replace/delete) and querying; beyond that -> 429
+ADMISSION_QUEUE_TIMEOUT= float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+ingest_admission= AdmissionController(
+    "ingest",
+    max_concurrent=int(os.getenv("INGEST_MAX_CONCURRENCY", "2")),
+    max_queue=int(os.getenv("INGEST_MAX_QUEUE", "8")),
+    queue_timeout_seconds=ADMISSION_QUEUE_TIMEOUT,
+    max_per_session=int(os.getenv("INGEST_MAX_PER_SESSION", "0")),
+)
+query_admission= AdmissionController(
+    "query",
+    max_concurrent=int(os.getenv("QUERY_MAX_CONCURRENCY", "16")),
+    max_queue=int(os.getenv("QUERY_MAX_QUEUE", "64")),
+    queue_timeout_seconds=ADMISSION_QUEUE_TIMEOUT,
+    max_per_session=int(os.getenv("QUERY_MAX_PER_SESSION", "0")),
+)
+
+
+def _warm_up() -> None:
+    """Import the lazily loaded modules, build shared LLM/embedding clients and pre-load hot indexes"""
+    import langchain_community.vectorstores.faiss  # noqa: F401
+    import langchain_community.document_loaders  # noqa: F401
+    import langchain_text_splitters  # noqa: F401
+
+    loader= get_model_loader()
+    embeddings= loader.load_embeddings()
+    loader.load_llm()
+    for sid in PRELOAD_SESSIONS:
+        index_dir= os.path.join(FAISS_BASE, sid)
+        if not os.path.isdir(index_dir):
+            log.warning("Preload session skipped, index not found", session_id=sid)
+            continue
+        index_cache.get(index_dir, embeddings, index_name=FAISS_INDEX_NAME)
+    log.info("Warm-up completed", preloaded_sessions=len(PRELOAD_SESSIONS))
+
+
+async def _run_warm_up() -> None:
+    try:
+        await asyncio.to_thread(_warm_up)
+    except Exception as e:
+        # Warm-up is best effort: the first request will build whatever is missing
+        log.warning("Warm-up failed", error=str(e))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks= []
+    if WARMUP_ON_STARTUP:
+        if WARMUP_BLOCKING:
+            await _run_warm_up()
+        else:
+            # Do not hold back the health check; warm up while the worker already serves traffic
+            tasks.append(asyncio.create_task(_run_warm_up()))
+    if storage.enabled:
+        tasks.append(asyncio.create_task(storage.run(STORAGE_SWEEP_INTERVAL)))
+    yield
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+
+
+app= FastAPI(title="Document Chatting System", version="0.1", lifespan=lifespan)
+
 BASE_DIR= Path(__file__).resolve().parent.parent
 
 app.mount("/static", StaticFiles(directory=str(BASE_DIR/"static")), name= "static")
@@ -34,6 +126,11 @@ app.add_middleware(
     allow_headers=["*"],
     )
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(status_code=429, content={"detail": str(exc), "limiter": exc.limiter, "reason": exc.reason},
+                        headers={"Retry-After": str(exc.retry_after)})
+
 @app.get("/", response_class= HTMLResponse)
 async def serve_ui(request:Request):
     log.info ("Serving UI Homepage")
@@ -46,6 +143,14 @@ def health() -> Dict[str,str]:
     log.info("Health checked passed")
     return {"status":"ok", "service":"Document_CHatting"}
 
+@app.get("/metrics")
+def metrics() -> Dict[str, Any]:
+    parse_cache= get_parse_cache()
+    return {"storage": storage.metrics(),
+            "parse_cache": parse_cache.metrics() if parse_cache else None,
+            "admission": {"ingest": ingest_admission.metrics(), "query": query_admission.metrics()},
+            "llm_router": router_stats()}
+
 #--------------------CHAT INDEX--------------------#
 
 @app.post("/chat/index")
@@ -57,74 +162,209 @@ async def chat_build_index (
     chunk_overlap:int =Form(200),
     k:int= Form (5)
 ) ->Any:
-    try:
-      log.info(f"Indexing chat Session", Session_id= {session_id}, Files=[f.filename for f in files]) #Extracting file name from group of files
-      wrapped= [FastApiFileHandler(f) for f in files] # Through FastAPiFileHandler: Convert FAST API File object into Python readable file name
+    async with ingest_admission.slot(session_id):
+        try:
+          log.info(f"Indexing chat Session", Session_id= {session_id}, Files=[f.filename for f in files]) #Extracting file name from group of files
+          wrapped= [FastApiFileHandler(f) for f in files] # Through FastAPiFileHandler: Convert FAST API File object into Python readable file name
 
-      #Remember : .filename is file name get through FASTAPT::::But, file.name is use in Python for Reading Purpose
+          #Remember : .filename is file name get through FASTAPT::::But, file.name is use in Python for Reading Purpose
     
-        # Calling CLass ChatIngestor present in DataIngestion through Object(ci)
-      ci= ChatIngestor(
-          temp_base = UPLOAD_BASE,
-          faiss_base = FAISS_BASE,
-          use_session_dirs = use_session_dirs,
-          session_id = session_id or None,
-    
-      )
+            # Calling CLass ChatIngestor present in DataIngestion through Object(ci)
+          sid= session_id or generate_session_id()
 
-      # Call MethoD to Built Retriver
+          def build() -> ChatIngestor:
+              ci= ChatIngestor(
+                  temp_base = UPLOAD_BASE,
+                  faiss_base = FAISS_BASE,
+                  use_session_dirs = use_session_dirs,
+                  session_id = sid,
+              )
+              # Call MethoD to Built Retriver
+              ci.built_in_retrieval (wrapped, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+              return ci
 
-      ci.built_in_retrieval (
-          wrapped, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+          ci= await asyncio.to_thread(_while_ingesting, sid, build)
+          if storage.delete_uploads_after_index:
+              await asyncio.to_thread(storage.discard_uploads, ci.saved_paths)
 
-      log.info (f"Index creating Sucessfully for session {ci.session_id}")
-      return ({"session_id": ci.session_id, "k":k, "use_session_dirs": use_session_dirs})
+          log.info (f"Index creating Sucessfully for session {ci.session_id}")
+          return ({"session_id": ci.session_id, "k":k, "use_session_dirs": use_session_dirs})
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        log.exception("chat index building failed")
-        raise HTTPException(status_code=500, detail=f"Indexing failed: {e}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            log.exception("chat index building failed")
+            raise HTTPException(status_code=500, detail=f"Indexing failed: {e}")
+
+#----------------CHAT DOCUMENTS----------------------#
+
+def _while_ingesting(session_id: str, fn: Callable[[], Any]) -> Any:
+    """Run fn (save uploads, parse, embed, index) with the session marked as being ingested,
+    so a storage sweep cannot evict it underneath; touched before and after"""
+    with storage.ingesting(session_id):
+        storage.touch(session_id)
+        out= fn()
+        storage.touch(session_id)
+        return out
+
+def _session_ingestor(session_id: str) -> ChatIngestor:
+    """ChatIngestor for an existing session index (404 if the session has no index)"""
+    if not os.path.isdir(os.path.join(FAISS_BASE, session_id)):
+        raise HTTPException(status_code=404, detail=f"No FAISS index for session {session_id}")
+    return ChatIngestor(temp_base=UPLOAD_BASE, faiss_base=FAISS_BASE, use_session_dirs=True, session_id=session_id)
+
+@app.get("/chat/documents")
+async def chat_list_documents(session_id: str) -> Any:
+    # Reads the manifest; indexes written before it tracked sources are loaded in full, hence the limiter
+    async with query_admission.slot(session_id):
+        try:
+            index_dir= os.path.join(FAISS_BASE, session_id)
+            if not os.path.isdir(index_dir):
+                raise HTTPException(status_code=404, detail=f"No FAISS index for session {session_id}")
+            docs= await asyncio.to_thread(list_indexed_documents, Path(index_dir))
+            return {"session_id": session_id,
+                    "documents": [{"source": src, "chunks": n} for src, n in sorted(docs.items())]}
+        except HTTPException:
+            raise
+        except Exception as e:
+            log.exception("listing documents failed")
+            raise HTTPException(status_code=500, detail=f"Listing documents failed: {e}")
+
+@app.delete("/chat/documents")
+async def chat_delete_document(session_id: str, source: str) -> Any:
+    async with ingest_admission.slot(session_id):
+        try:
+            ci= _session_ingestor(session_id)
+            if source not in await asyncio.to_thread(ci.list_documents):
+                raise HTTPException(status_code=404, detail=f"Document {source} not found in session {session_id}")
+            removed= await asyncio.to_thread(ci.delete_document, source)
+            storage.touch(session_id)
+            log.info("Document deleted", session_id=session_id, source=source, removed=removed)
+            return {"session_id": session_id, "source": source, "removed": removed}
+        except HTTPException:
+            raise
+        except Exception as e:
+            log.exception("document delete failed")
+            raise HTTPException(status_code=500, detail=f"Delete failed: {e}")
+
+@app.put("/chat/documents")
+async def chat_replace_document(
+    file: UploadFile = File(...),
+    session_id: str = Form(...),
+    source: str = Form(...),
+    chunk_size: int = Form(1000),
+    chunk_overlap: int = Form(200),
+) -> Any:
+    async with ingest_admission.slot(session_id):
+        try:
+            ci= _session_ingestor(session_id)
+            if source not in await asyncio.to_thread(ci.list_documents):
+                raise HTTPException(status_code=404, detail=f"Document {source} not found in session {session_id}")
+            stats= await asyncio.to_thread(
+                _while_ingesting, session_id,
+                lambda: ci.replace_document(source, FastApiFileHandler(file),
+                                            chunk_size=chunk_size, chunk_overlap=chunk_overlap))
+            if storage.delete_uploads_after_index:
+                await asyncio.to_thread(storage.discard_uploads, ci.saved_paths)
+            log.info("Document replaced", session_id=session_id, source=source, **stats)
+            return {"session_id": session_id, "source": source, **stats}
+        except HTTPException:
+            raise
+        except Exception as e:
+            log.exception("document replace failed")
+            raise HTTPException(status_code=500, detail=f"Replace failed: {e}")
 
 #----------------CHAT QUERY----------------------#
+def _query_filters(filters: Any) -> Optional[Dict[str, List[str]]]:
+    """Metadata filters from a request (JSON text for form posts); 400 if malformed"""
+    try:
+        if isinstance(filters, str):
+            filters= json.loads(filters) if filters.strip() else None
+        if filters is not None and not isinstance(filters, dict):
+            raise ValueError("filters must be a JSON object")
+        return normalize_filters(filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filters: {e}")
+
 @app.post("/chat/query")
 async def chat_query (
     question:str = Form(...),
     session_id: Optional[str]= Form(None),
     use_session_dir:bool= Form(True),
     k:int=Form (5),
+    filters: Optional[str]= Form(None),  # e.g. {"filename": "handbook_2025.pdf", "page": [3, 4]}
 )-> Any:
-     try:
-        log.info ("Received Chat Query '{question}' | session: {session_id}")
-        if use_session_dir and not session_id:
-            raise HTTPException(status_code=400, detail= "Session_id is Required when use_session_directory is True")
+    async with query_admission.slot(session_id):
+         try:
+            log.info ("Received Chat Query '{question}' | session: {session_id}")
+            if use_session_dir and not session_id:
+                raise HTTPException(status_code=400, detail= "Session_id is Required when use_session_directory is True")
+            query_filters= _query_filters(filters)
         
-        index_dir= os.path.join(FAISS_BASE, session_id) if use_session_dir else FAISS_BASE
-        if not os.path.isdir(index_dir):
-            raise HTTPException (status_code= 404, details=f"FAISS Index is not found at {index_dir}")
+            index_dir= os.path.join(FAISS_BASE, session_id) if use_session_dir else FAISS_BASE
+            if not os.path.isdir(index_dir):
+                raise HTTPException (status_code= 404, detail=f"FAISS Index is not found at {index_dir}")
         
-        rag= ConversationalRag (session_id=session_id)
-        rag.load_retriever_from_faiss (index_dir, k=5, index_name= FAISS_INDEX_NAME)
-        response=rag.invoke(question, chat_history=[])
-        log.info ("Chat Query Handled Succesfully")
-
-        return{
-            "answer": response,
-            "session_id":session_id,
-            "k": k,
-            "engine": "LCEL-RAG"
-        }
+            storage.touch(session_id)
+            rag= await asyncio.to_thread(ConversationalRag, session_id=session_id)
+            await asyncio.to_thread(rag.load_retriever_from_faiss, index_dir, k=k, index_name= FAISS_INDEX_NAME,
+                                    filters=query_filters)
+            response= await rag.ainvoke(question, chat_history=[])
+            log.info ("Chat Query Handled Succesfully")
 
-     except HTTPException:
-         raise
-     except Exception as e:
-         log.exception ("chat query failed")
-         raise HTTPException(status_code=500, detail=f"Query failed: {e}")
-         
+            return{
+                "answer": response,
+                "session_id":session_id,
+                "k": k,
+                "filters": query_filters,
+                "engine": "LCEL-RAG"
+            }
 
+         except HTTPException:
+             raise
+         except Exception as e:
+             log.exception ("chat query failed")
+             raise HTTPException(status_code=500, detail=f"Query failed: {e}")
 
+#----------------CHAT QUERY BATCH----------------------#
+@app.post("/chat/query/batch")
+async def chat_query_batch(req: BatchQueryRequest) -> Any:
+    """Many questions against one session: index loaded once, one embedding call, one FAISS search,
+    answers generated concurrently and returned in order with per-item errors.
+    Takes one query slot per concurrent generation, like that many single queries would"""
+    concurrency= max(1, min(req.max_concurrency, MAX_BATCH_CONCURRENCY))
+    async with query_admission.slot(req.session_id, weight=concurrency):
+        try:
+            log.info("Received batch query", session_id=req.session_id, questions=len(req.questions))
+            if not req.questions:
+                raise HTTPException(status_code=400, detail="questions must not be empty")
+            if len(req.questions) > MAX_BATCH_QUESTIONS:
+                raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUESTIONS} questions per batch")
+            query_filters= _query_filters(req.filters)
 
+            index_dir= os.path.join(FAISS_BASE, req.session_id)
+            if not os.path.isdir(index_dir):
+                raise HTTPException(status_code=404, detail=f"FAISS Index is not found at {index_dir}")
 
+            storage.touch(req.session_id)
+            rag= await asyncio.to_thread(ConversationalRag, session_id=req.session_id)
+            await asyncio.to_thread(rag.load_retriever_from_faiss, index_dir, k=req.k, index_name=FAISS_INDEX_NAME)
+            results= await rag.abatch_invoke(req.questions, k=req.k,
+                                             max_concurrency=concurrency,
+                                             filters=query_filters)
+            log.info("Batch query handled", session_id=req.session_id, errors=sum(1 for r in results if r["error"]))
+            return {
+                "session_id": req.session_id,
+                "k": req.k,
+                "filters": query_filters,
+                "results": results,
+                "engine": "LCEL-RAG-batch",
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            log.exception("chat batch query failed")
+            raise HTTPException(status_code=500, detail=f"Batch query failed: {e}")
 
 
 #uvicorn api.main:app --port 8080 --reload 
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""Overload benchmark for admission control on /chat/query.
+
+The app runs in-process (httpx ASGITransport) on a fake provider that serves at most --capacity
+calls at a time in --service seconds each, like a rate-limited LLM API. Requests arrive open-loop
+at --overload times that capacity for --seconds, once with admission control off and once on:
+
+    off   every request is accepted and waits inside the worker; latency grows for as long as
+          the burst lasts
+    on    --capacity requests run, a short queue waits, the rest get 429 + Retry-After at once;
+          admitted requests keep a bounded latency
+
+    python -m benchmarks.admission_load
+    python -m benchmarks.admission_load --capacity 8 --overload 3 --seconds 10
+"""
+from __future__ import annotations
+import os
+import argparse
+import logging
+import asyncio
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+WORK = Path(tempfile.mkdtemp(prefix="admission_bench_"))
+os.environ.setdefault("FAISS_BASE", str(WORK / "faiss_index"))
+os.environ.setdefault("UPLOAD_BASE", str(WORK / "data"))
+os.environ["WARMUP_ON_STARTUP"] = "false"
+os.environ["PARSE_CACHE_DIR"] = ""
+
+import httpx  # noqa: E402
+import api.main as main  # noqa: E402
+import utils.model_loader as model_loader  # noqa: E402
+from src.data_ingestion import FaissManager  # noqa: E402
+from utils.admission import AdmissionController  # noqa: E402
+from utils.fake_models import FakeChatModel, FakeModelLoader  # noqa: E402
+from utils.metrics import percentile  # noqa: E402
+
+
+class CapacityLimitedModel(FakeChatModel):
+    """Fake provider that serves at most `capacity` calls at once; the rest wait their turn"""
+    def __init__(self, capacity: int, service: float):
+        super().__init__(name="provider", latency=service)
+        self._slots = threading.BoundedSemaphore(capacity)
+
+    def invoke(self, input, config=None, **kwargs):
+        with self._slots:
+            return super().invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await asyncio.to_thread(self.invoke, input, config, **kwargs)
+
+
+async def run(rate: float, seconds: float) -> Tuple[List[float], Dict[int, int], float]:
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench",
+                                 timeout=None) as client:
+        async def one() -> None:
+            t0 = time.perf_counter()
+            resp = await client.post("/chat/query", data={"question": "how long is paid leave", "session_id": "s1"})
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+            if resp.status_code == 200:
+                latencies.append(time.perf_counter() - t0)
+
+        t_start = time.perf_counter()
+        tasks = []
+        for i in range(int(rate * seconds)):
+            delay = t_start + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one()))
+        await asyncio.gather(*tasks)
+        return latencies, statuses, time.perf_counter() - t_start
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capacity", type=int, default=4, help="concurrent provider calls")
+    parser.add_argument("--service", type=float, default=0.1, help="seconds per provider call")
+    parser.add_argument("--overload", type=float, default=2.0, help="offered load / capacity")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--queue", type=int, default=None, help="admission queue (default: capacity)")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    loader = FakeModelLoader(llm=CapacityLimitedModel(args.capacity, args.service))
+    model_loader._shared_loader = loader
+    Path(main.FAISS_BASE).mkdir(parents=True, exist_ok=True)
+    FaissManager(Path(main.FAISS_BASE) / "s1", loader).load_or_create(
+        texts=["Employees accrue paid leave monthly.", "Unused leave carries over up to ten days."],
+        metadatas=[{"source": "handbook.pdf"}] * 2)
+
+    capacity_rps = args.capacity / args.service
+    rate = capacity_rps * args.overload
+    print(f"provider capacity {capacity_rps:.0f} calls/s, offered {rate:.0f} queries/s for {args.seconds:.0f}s")
+    print("(a query makes one provider call to rewrite the question and one to answer it)\n")
+    print(f"{'admission':<12}{'ok':>6}{'429':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'ok/s':>8}")
+    configs = [
+        ("off", AdmissionController("query", max_concurrent=0)),
+        ("on", AdmissionController("query", max_concurrent=args.capacity,
+                                   max_queue=args.capacity if args.queue is None else args.queue)),
+    ]
+    for name, ctrl in configs:
+        main.query_admission = ctrl
+        latencies, statuses, elapsed = asyncio.run(run(rate, args.seconds))
+        ms = [x * 1000 for x in latencies] or [0.0]
+        print(f"{name:<12}{statuses.get(200, 0):>6}{statuses.get(429, 0):>6}{statistics.median(ms):>10.0f}"
+              f"{percentile(ms, 95):>10.0f}{percentile(ms, 99):>10.0f}{max(ms):>10.0f}{statuses.get(200, 0) / elapsed:>8.1f}")
+        other = {k: v for k, v in statuses.items() if k not in (200, 429)}
+        if other:
+            print(f"{'':<12}other statuses: {other}")
+
+
+if __name__ == "__main__":
+    try:
+        main_()
+    finally:
+        shutil.rmtree(WORK, ignore_errors=True)
@@ -0,0 +1,99 @@
+"""Filtered retrieval benchmark: FAISS IDSelector pre-filtering vs LangChain post-filtering.
+
+A session index of --chunks synthetic 768-d vectors spread over --sources files (contiguous
+chunks per file, as ingestion adds them). Each query asks about one file; its vector is drawn
+near a random chunk of the whole session, so most of the unfiltered neighbours belong to other
+files, the hard case for post-filtering. Compared per query:
+
+    unfiltered          plain top-k search over the session (cost reference, ignores the filter)
+    post-filter         FAISS.similarity_search_with_score_by_vector(filter=...): fetch_k nearest
+                        over the whole session, then drop other files
+    id selector         search_vectors(subset=FacetIndex.select(...)): only the file's vectors
+                        are scored
+
+recall@k is against the exact top-k within the file.
+
+    python -m benchmarks.filtered_search
+    python -m benchmarks.filtered_search --chunks 100000 --sources 200
+"""
+from __future__ import annotations
+import argparse
+import time
+from typing import Callable, List
+import numpy as np
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from src.retrieval import search_vectors
+from utils.fake_models import FakeEmbeddings
+from utils.metadata_filter import FacetIndex, normalize_filters
+from utils.vector_compression import truncate_vectors
+
+
+def build(n: int, sources: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    per = n // sources
+    centers = rng.normal(size=(sources * 4, dim))
+    data = truncate_vectors(centers[rng.integers(0, len(centers), n)] + 0.7 * rng.normal(size=(n, dim)), dim)
+    ids = [str(i) for i in range(n)]
+    src = [f"file_{min(i // per, sources - 1):04d}.pdf" for i in range(n)]
+    index = faiss.IndexFlatL2(dim)
+    index.add(data)
+    vs = FAISS(embedding_function=FakeEmbeddings(), index=index,
+               docstore=InMemoryDocstore({i: Document(id=i, page_content=i, metadata={"source": s})
+                                          for i, s in zip(ids, src)}),
+               index_to_docstore_id=dict(enumerate(ids)))
+    return vs, data, np.array(src)
+
+
+def timed(fn: Callable[[int], List[str]], nq: int):
+    out, t0 = [], time.perf_counter()
+    for i in range(nq):
+        out.append(fn(i))
+    return out, (time.perf_counter() - t0) * 1000 / nq
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50_000)
+    parser.add_argument("--sources", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    vs, data, src = build(args.chunks, args.sources, args.dim)
+    facets = FacetIndex.from_vectorstore(vs)
+    rng = np.random.default_rng(1)
+    targets = [f"file_{t:04d}.pdf" for t in rng.integers(0, args.sources, args.queries)]
+    queries = truncate_vectors(data[rng.integers(0, args.chunks, args.queries)]
+                               + 0.3 * rng.normal(size=(args.queries, args.dim)), args.dim)
+    truth = []
+    for q, t in zip(queries, targets):
+        rows = np.flatnonzero(src == t)
+        d = ((data[rows] - q) ** 2).sum(1)
+        truth.append({str(r) for r in rows[np.argsort(d)[:args.k]]})
+
+    k = args.k
+    runs = {
+        "unfiltered": lambda i: [d.id for d, _ in search_vectors(vs, queries[i:i + 1], k)[0]],
+        "post-filter fetch_k=20": lambda i: [d.id for d, _ in vs.similarity_search_with_score_by_vector(
+            queries[i], k, filter={"source": targets[i]}, fetch_k=20)],
+        "post-filter fetch_k=1000": lambda i: [d.id for d, _ in vs.similarity_search_with_score_by_vector(
+            queries[i], k, filter={"source": targets[i]}, fetch_k=1000)],
+        "id selector": lambda i: [d.id for d, _ in search_vectors(
+            vs, queries[i:i + 1], k, subset=facets.select(normalize_filters({"source": targets[i]})))[0]],
+    }
+
+    print(f"{args.chunks} chunks in {args.sources} files ({args.chunks // args.sources} per file), {args.dim}-d, "
+          f"{args.queries} queries, k={k}\n")
+    print(f"{'method':<26}{'ms/query':>10}{'recall@' + str(k):>10}{'hits/query':>12}")
+    for name, fn in runs.items():
+        hits, ms = timed(fn, args.queries)
+        recall = np.mean([len(set(h) & t) / k for h, t in zip(hits, truth)])
+        print(f"{name:<26}{ms:>10.3f}{recall:>10.3f}{np.mean([len(h) for h in hits]):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Parsed-text cache benchmark: cost of a repeat upload of the same PDF.
+
+A text PDF is generated with PyMuPDF, then load_documents runs on two uploads of the same bytes
+under different names (as a second user or session would send it):
+
+    uncached   parser only (cache disabled)
+    first      parse + hash + cache write
+    repeat     hash + cache read
+
+    python -m benchmarks.parse_cache
+    python -m benchmarks.parse_cache --pages 300 --repeat 5
+"""
+from __future__ import annotations
+import os
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+import fitz
+from src.data_ingestion import load_documents
+from utils.parse_cache import ParsedTextCache
+
+LOREM = ("Employees accrue paid leave monthly. Requests go to the line manager at least two weeks "
+         "ahead. Unused leave carries over up to ten days. ")
+
+
+def make_pdf(path: Path, pages: int) -> None:
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        rc = page.insert_textbox(fitz.Rect(40, 40, 560, 800), f"Section {i}. " + LOREM * 10, fontsize=9)
+        if rc < 0:
+            raise ValueError("page text does not fit")
+    doc.save(str(path))
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    runs: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(runs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="parse_cache_bench_"))
+    try:
+        original = work / "handbook_a1b2c3.pdf"
+        make_pdf(original, args.pages)
+        reupload = work / "handbook_d4e5f6.pdf"
+        shutil.copy(original, reupload)
+
+        os.environ["PARSE_CACHE_DIR"] = ""  # disables the shared cache: load_documents parses every time
+        uncached = timed(lambda: load_documents([original]), args.repeat)
+
+        def first() -> None:
+            shutil.rmtree(work / "cache", ignore_errors=True)
+            load_documents([original], cache=ParsedTextCache(str(work / "cache")))
+
+        first_ms = timed(first, args.repeat)
+        cache = ParsedTextCache(str(work / "cache"))
+        repeat_ms = timed(lambda: load_documents([reupload], cache=cache), args.repeat)
+        size = sum(p.stat().st_size for p in (work / "cache").rglob("*.json.gz"))
+
+        print(f"{args.pages}-page PDF, {original.stat().st_size / 1e6:.2f} MB, cache entry {size / 1e3:.1f} kB\n")
+        print(f"{'uncached parse':<24}{uncached:>10.1f} ms")
+        print(f"{'first upload (cached)':<24}{first_ms:>10.1f} ms")
+        print(f"{'repeat upload':<24}{repeat_ms:>10.1f} ms   ({uncached / repeat_ms:.0f}x faster than parsing)")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
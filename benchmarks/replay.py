@@ -0,0 +1,258 @@
+"""Traffic replay: run a recorded log of /chat/index and /chat/query calls against a build.
+
+The log is JSONL, one call per line (see benchmarks/traffic/sample.jsonl):
+
+    {"ts": 1760947200.0, "endpoint": "/chat/index", "session_id": "hr-42",
+     "files": ["leave_policy.txt"], "chunk_size": 400, "chunk_overlap": 50}
+    {"ts": 1760947201.3, "endpoint": "/chat/query", "session_id": "hr-42",
+     "question": "How much unused leave carries over?", "k": 4}
+
+ts is epoch seconds or an ISO 8601 timestamp; files are looked up in --files-dir (default: the
+files/ directory next to the log). Calls are sent at their original offsets divided by --speed
+(0 sends them back to back), concurrently, except that a call waits for the session's earlier
+/chat/index calls to finish, as the original client did. Session ids get a per-run prefix so a
+replay never touches existing sessions.
+
+Targets:
+    in-process (default)   the app is called through httpx.ASGITransport with fake models and a
+                           temporary FAISS/upload/parse-cache directory
+    http://host:port       a running server, started with fake models:
+                           MODEL_BACKEND=fake uvicorn api.main:app --port 8080
+
+    python -m benchmarks.replay
+    python -m benchmarks.replay my_traffic.jsonl --speed 4 --json report.json
+    python -m benchmarks.replay --target http://localhost:8080 --speed 0
+"""
+from __future__ import annotations
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import argparse
+import logging
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import httpx
+from utils.metrics import percentile
+
+ENDPOINTS = ("/chat/index", "/chat/query")
+SAMPLE_LOG = Path(__file__).resolve().parent / "traffic" / "sample.jsonl"
+
+
+@dataclass
+class TrafficEvent:
+    offset: float  # seconds after the first call in the log
+    endpoint: str
+    session_id: str
+    question: Optional[str] = None
+    files: List[str] = field(default_factory=list)
+    k: int = 5
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+
+
+@dataclass
+class CallResult:
+    endpoint: str
+    status: Optional[int]  # None when the call failed before a response (connection error, timeout)
+    latency: float
+    lag: float  # how late the call was sent compared to its scaled offset
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status is not None and 200 <= self.status < 300
+
+
+def _timestamp(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def load_log(path: Path) -> List[TrafficEvent]:
+    rows: List[Tuple[float, Dict[str, Any]]] = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row.get("endpoint") not in ENDPOINTS:
+                raise ValueError(f"{path}:{n}: endpoint must be one of {ENDPOINTS}, got {row.get('endpoint')!r}")
+            if row["endpoint"] == "/chat/query" and not row.get("question"):
+                raise ValueError(f"{path}:{n}: /chat/query needs a question")
+            if row["endpoint"] == "/chat/index" and not row.get("files"):
+                raise ValueError(f"{path}:{n}: /chat/index needs files")
+            rows.append((_timestamp(row["ts"]), row))
+    rows.sort(key=lambda r: r[0])
+    t0 = rows[0][0] if rows else 0.0
+    return [
+        TrafficEvent(offset=ts - t0, endpoint=row["endpoint"], session_id=str(row["session_id"]),
+                     question=row.get("question"), files=list(row.get("files") or []), k=int(row.get("k", 5)),
+                     chunk_size=int(row.get("chunk_size", 1000)), chunk_overlap=int(row.get("chunk_overlap", 200)))
+        for ts, row in rows
+    ]
+
+
+async def _send(client: httpx.AsyncClient, ev: TrafficEvent, session_id: str, files_dir: Path) -> httpx.Response:
+    if ev.endpoint == "/chat/query":
+        return await client.post("/chat/query", data={"question": ev.question, "session_id": session_id, "k": ev.k})
+    files = [("files", (name, (files_dir / name).read_bytes())) for name in ev.files]
+    return await client.post("/chat/index", files=files,
+                              data={"session_id": session_id, "chunk_size": ev.chunk_size,
+                                    "chunk_overlap": ev.chunk_overlap})
+
+
+async def replay(events: List[TrafficEvent], client: httpx.AsyncClient, files_dir: Path,
+                 speed: float = 1.0, session_prefix: str = "") -> Tuple[List[CallResult], float]:
+    """Send every event at offset / speed; returns per-call results (in log order) and wall time"""
+    results: List[Optional[CallResult]] = [None] * len(events)
+    last_index: Dict[str, asyncio.Task] = {}  # session -> its latest /chat/index call
+
+    async def call(i: int, ev: TrafficEvent, after: Optional[asyncio.Task], due: float) -> None:
+        if after is not None:
+            await asyncio.gather(after, return_exceptions=True)
+        t0 = time.perf_counter()
+        lag = max(0.0, t0 - due)
+        try:
+            resp = await _send(client, ev, session_prefix + ev.session_id, files_dir)
+            error = None if resp.is_success else resp.text[:200]
+            results[i] = CallResult(ev.endpoint, resp.status_code, time.perf_counter() - t0, lag, error)
+        except (httpx.HTTPError, OSError) as e:
+            results[i] = CallResult(ev.endpoint, None, time.perf_counter() - t0, lag, f"{type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    tasks = []
+    for i, ev in enumerate(events):
+        due = start + (ev.offset / speed if speed > 0 else 0.0)
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(call(i, ev, last_index.get(ev.session_id), due))
+        if ev.endpoint == "/chat/index":
+            last_index[ev.session_id] = task
+        tasks.append(task)
+    await asyncio.gather(*tasks)
+    return [r for r in results if r is not None], time.perf_counter() - start
+
+
+def summarize(results: List[CallResult], elapsed: float) -> Dict[str, Dict[str, Any]]:
+    """Per-endpoint (and "all") counts, throughput, error rate and latency percentiles in ms"""
+    groups: Dict[str, List[CallResult]] = {}
+    for r in results:
+        groups.setdefault(r.endpoint, []).append(r)
+    groups["all"] = list(results)
+
+    def ms(x: Optional[float]) -> Optional[float]:
+        return None if x is None else round(x * 1000, 1)
+
+    report = {}
+    for name, rs in groups.items():
+        ok = [r.latency for r in rs if r.ok]
+        statuses: Dict[str, int] = {}
+        for r in rs:
+            key = str(r.status) if r.status is not None else "transport_error"
+            statuses[key] = statuses.get(key, 0) + 1
+        report[name] = {
+            "requests": len(rs), "ok": len(ok), "errors": len(rs) - len(ok),
+            "error_rate": round((len(rs) - len(ok)) / len(rs), 4) if rs else 0.0,
+            "throughput_rps": round(len(ok) / elapsed, 2) if elapsed > 0 else None,
+            "p50_ms": ms(percentile(ok, 50)), "p95_ms": ms(percentile(ok, 95)), "p99_ms": ms(percentile(ok, 99)),
+            "max_ms": ms(max(ok) if ok else None),
+            "max_lag_ms": ms(max((r.lag for r in rs), default=None)),
+            "statuses": statuses,
+        }
+    return report
+
+
+@contextmanager
+def inprocess_app(work_dir: Path) -> Iterator[Any]:
+    """api.main.app with fake models and all session storage under work_dir (restored on exit)"""
+    import api.main as main
+    import utils.model_loader as model_loader
+    import utils.parse_cache as parse_cache
+    from utils.storage_manager import SessionStorageManager
+
+    saved = (main.FAISS_BASE, main.UPLOAD_BASE, main.storage,
+             model_loader._shared_loader, parse_cache._default_cache, os.environ.get("PARSE_CACHE_DIR"))
+    faiss_base, upload_base = work_dir / "faiss_index", work_dir / "data"
+    faiss_base.mkdir(parents=True, exist_ok=True)
+    upload_base.mkdir(parents=True, exist_ok=True)
+    main.FAISS_BASE, main.UPLOAD_BASE = str(faiss_base), str(upload_base)
+    main.storage = SessionStorageManager(upload_base=str(upload_base), faiss_base=str(faiss_base))
+    model_loader._shared_loader = model_loader._fake_model_loader()
+    parse_cache._default_cache = None
+    os.environ["PARSE_CACHE_DIR"] = str(work_dir / "parse_cache")
+    try:
+        yield main.app
+    finally:
+        (main.FAISS_BASE, main.UPLOAD_BASE, main.storage,
+         model_loader._shared_loader, parse_cache._default_cache, cache_dir) = saved
+        if cache_dir is None:
+            os.environ.pop("PARSE_CACHE_DIR", None)
+        else:
+            os.environ["PARSE_CACHE_DIR"] = cache_dir
+
+
+def print_report(report: Dict[str, Dict[str, Any]]) -> None:
+    def cell(v: Optional[float]) -> str:
+        return "-" if v is None else f"{v:.0f}"
+
+    print(f"{'endpoint':<14}{'reqs':>6}{'ok':>6}{'err%':>7}{'ok/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, r in report.items():
+        print(f"{name:<14}{r['requests']:>6}{r['ok']:>6}{r['error_rate'] * 100:>7.1f}{r['throughput_rps'] or 0:>8.2f}"
+              f"{cell(r['p50_ms']):>9}{cell(r['p95_ms']):>9}{cell(r['p99_ms']):>9}{cell(r['max_ms']):>9}")
+    statuses = report.get("all", {}).get("statuses", {})
+    if any(s != "200" for s in statuses):
+        print(f"statuses: {statuses}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", nargs="?", type=Path, default=SAMPLE_LOG)
+    parser.add_argument("--target", default="in-process", help="'in-process' or a base URL")
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale: 2 = twice as fast, 0 = no waits")
+    parser.add_argument("--files-dir", type=Path, default=None)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM seconds per call (in-process)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", type=Path, default=None, help="also write the report here")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    events = load_log(args.log)
+    files_dir = args.files_dir or args.log.parent / "files"
+    prefix = f"replay-{uuid.uuid4().hex[:6]}-"
+    span = events[-1].offset if events else 0.0
+
+    async def run(transport: Optional[httpx.AsyncBaseTransport], base_url: str):
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout) as client:
+            return await replay(events, client, files_dir, speed=args.speed, session_prefix=prefix)
+
+    if args.target == "in-process":
+        os.environ["FAKE_LLM_LATENCY"] = str(args.llm_latency)
+        work = Path(tempfile.mkdtemp(prefix="replay_"))
+        try:
+            with inprocess_app(work) as app:
+                results, elapsed = asyncio.run(run(httpx.ASGITransport(app=app), "http://replay"))
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+    else:
+        results, elapsed = asyncio.run(run(None, args.target))
+
+    report = summarize(results, elapsed)
+    print(f"\n{len(events)} calls from {args.log.name} (span {span:.1f}s) replayed against {args.target} "
+          f"at speed {args.speed:g} in {elapsed:.1f}s, sessions prefixed {prefix}\n")
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps({"log": str(args.log), "target": args.target, "speed": args.speed,
+                                         "elapsed_s": round(elapsed, 3), "report": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Startup-time benchmark: import cost of api.main and of each heavy module it used to pull in.
+
+Every measurement runs in a fresh interpreter (``python -X importtime``) so results are cold.
+
+    python -m benchmarks.startup_time
+    python -m benchmarks.startup_time --top 25 --repeat 3
+"""
+from __future__ import annotations
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Modules that are now imported lazily (on first use or by the lifespan warm-up)
+HEAVY_MODULES = [
+    "langchain_google_genai",
+    "langchain_groq",
+    "fitz",
+    "langchain_community.document_loaders",
+    "langchain_community.vectorstores.faiss",
+    "langchain_text_splitters",
+    "faiss",
+]
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """Return {module: cumulative microseconds} for a cold ``import module``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    times: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module: str, repeat: int) -> Tuple[float, Dict[str, int]]:
+    runs: List[Dict[str, int]] = [import_times(module) for _ in range(repeat)]
+    total_ms = statistics.median(r.get(module, 0) for r in runs) / 1000
+    return total_ms, runs[-1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list for api.main")
+    parser.add_argument("--repeat", type=int, default=3, help="cold runs per measurement (median is reported)")
+    args = parser.parse_args()
+
+    total_ms, times = measure("api.main", args.repeat)
+    print(f"import api.main: {total_ms:8.1f} ms (median of {args.repeat} cold runs)\n")
+
+    print(f"{'slowest modules under api.main':<60}{'cumulative ms':>14}")
+    for name, us in sorted(times.items(), key=lambda kv: kv[1], reverse=True)[: args.top]:
+        print(f"{name:<60}{us / 1000:>14.1f}")
+
+    print(f"\n{'heavy module':<45}{'loaded by api.main':>20}{'cold import ms':>16}")
+    for module in HEAVY_MODULES:
+        try:
+            ms, _ = measure(module, args.repeat)
+        except RuntimeError:
+            print(f"{module:<45}{'-':>20}{'not installed':>16}")
+            continue
+        print(f"{module:<45}{str(module in times):>20}{ms:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
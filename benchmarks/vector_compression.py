@@ -0,0 +1,87 @@
+"""Compressed vector storage benchmark: index bytes per 10k chunks, search latency and recall@5.
+
+Every format is compared with the current one (flat float32, 768-d like models/text-embedding-004)
+on synthetic embeddings whose variance decays across dimensions, as in real embedding models, so
+truncation is meaningful. Search goes through src.retrieval.search_vectors, the query path.
+
+    python -m benchmarks.vector_compression
+    python -m benchmarks.vector_compression --chunks 50000 --queries 500
+"""
+from __future__ import annotations
+import argparse
+import time
+from typing import List, Tuple
+import numpy as np
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from src.retrieval import search_vectors
+from utils.fake_models import FakeEmbeddings
+from utils.vector_compression import VectorFormat, FullVectorStore, quantize_index, truncate_vectors
+
+FORMATS: List[Tuple[str, VectorFormat]] = [
+    ("float32 (current)", VectorFormat()),
+    ("fp16", VectorFormat(codec="fp16")),
+    ("int8", VectorFormat(codec="int8")),
+    ("int8 + rescore", VectorFormat(codec="int8", rescore=True)),
+    ("dim 256", VectorFormat(dim=256, dim_mode="truncate")),
+    ("dim 256 + int8", VectorFormat(dim=256, dim_mode="truncate", codec="int8")),
+    ("dim 256 + int8 + rescore", VectorFormat(dim=256, dim_mode="truncate", codec="int8", rescore=True)),
+]
+
+
+def synthetic(n: int, nq: int, dim: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    scale = 1.0 / np.sqrt(np.arange(1, dim + 1))                  # decaying spectrum
+    centers = rng.normal(size=(max(1, n // 50), dim)) * scale
+    data = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.normal(size=(n, dim)) * scale
+    queries = data[rng.integers(0, n, nq)] + 0.3 * rng.normal(size=(nq, dim)) * scale
+    return truncate_vectors(data, dim), truncate_vectors(queries, dim)
+
+
+def build(vectors: np.ndarray, fmt: VectorFormat):
+    ids = [str(i) for i in range(len(vectors))]
+    if fmt.dim:
+        vectors = truncate_vectors(vectors, fmt.dim)
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    index = quantize_index(index, fmt.codec)
+    vs = FAISS(embedding_function=FakeEmbeddings(), index=index,
+               docstore=InMemoryDocstore({i: Document(id=i, page_content=i) for i in ids}),
+               index_to_docstore_id=dict(enumerate(ids)))
+    full = FullVectorStore(ids, vectors) if fmt.rescore else None
+    return vs, full
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    data, queries = synthetic(args.chunks, args.queries, args.dim)
+    _, truth = faiss.knn(queries, data, args.k)
+    per_10k = 10_000 / args.chunks
+
+    print(f"{args.chunks} chunks, {args.dim}-d, {args.queries} queries, k={args.k}\n")
+    print(f"{'format':<28}{'RAM MB/10k':>12}{'disk-only MB/10k':>18}{'ms/query':>10}{'recall@' + str(args.k):>10}")
+    for name, fmt in FORMATS:
+        vs, full = build(data, fmt)
+        ram = len(faiss.serialize_index(vs.index)) * per_10k / 1e6
+        disk = (full.vectors.nbytes * per_10k / 1e6) if full is not None else 0.0
+        q = truncate_vectors(queries, fmt.dim) if fmt.dim else queries
+
+        t0 = time.perf_counter()
+        hits = [search_vectors(vs, q[i:i + 1], args.k, full_vectors=full, oversample=fmt.oversample)[0]
+                for i in range(len(q))]
+        ms = (time.perf_counter() - t0) * 1000 / len(q)
+
+        recall = np.mean([len({int(d.id) for d, _ in row} & set(t)) / args.k for row, t in zip(hits, truth)])
+        print(f"{name:<28}{ram:>12.2f}{disk:>18.2f}{ms:>10.3f}{recall:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 from pydantic import BaseModel, RootModel
-from typing import List, Union
+from typing import Any, Dict, List, Optional, Union
 from enum import Enum
 
 class PromptType(str, Enum):
     CONTEXTUALIZE_QUESION ="contextualize_question"
     CONTEXT_QA = "context_qa"
 
+
+class BatchQueryRequest(BaseModel):
+    session_id: str
+    questions: List[str]
+    k: int = 5
+    max_concurrency: int = 4
+    filters: Optional[Dict[str, Any]] = None  # {"filename" | "source" | "page" | "file_type": value or [values]}
@@ -16,7 +16,7 @@ setup(
     description="An intelligent chat portal for enterprise documents using LLMs",
     long_description=Path("README.md").read_text(encoding="utf-8"),
     long_description_content_type="text/markdown",
-    packages=find_packages(exclude=["tests*", "examples*"]),
+    packages=find_packages(exclude=["tests*", "examples*", "benchmarks*"]),
     include_package_data=True,
     install_requires=parse_requirements("requirements.txt"),
     extras_require={
@@ -6,20 +6,24 @@ import uuid
 import hashlib
 import shutil
 from pathlib import Path
-from typing import Iterable, List, Optional, Dict, Any
-import fitz
-from langchain.schema import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
-from langchain_community.vectorstores import FAISS
-
-from langchain_community.vectorstores import FAISS
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Dict, Any, TYPE_CHECKING
+from langchain_core.documents import Document
 from logger import global_logger as log
 from exceptions.custom_exception import DocumentPortalException
-from utils.model_loader import ModelLoader
+from utils.model_loader import ModelLoader, get_model_loader
+from utils.vector_compression import VectorFormat, FullVectorStore, quantize_index, wrap_embeddings
+from utils.index_store import IndexSnapshotStore
+from utils.parse_cache import ParsedTextCache, get_parse_cache, file_sha256
+from utils.metadata_filter import FacetIndex, facet_values
 from utils.file_IO import *
 import re
 
+# Loaders, the text splitter and FAISS are imported where they are used, so importing this
+# module (and api.main) stays cheap; the API lifespan warms them up in the background.
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+
 
 Supported_Extensions= (".pdf", ".txt", ".docx")
 
@@ -27,9 +31,10 @@ class ChatIngestor:
     def __init__ (self, temp_base:str = "data", 
                   faiss_base:str = "faiss_index",
                   use_session_dirs:bool = True,
-                  session_id:Optional[str] = None,):
+                  session_id:Optional[str] = None,
+                  model_loader:Optional[ModelLoader] = None,):
        try:
-            self.model_loader= ModelLoader()
+            self.model_loader= model_loader or get_model_loader()
             self.use_session = bool (use_session_dirs)
 
             self.session_id= session_id or generate_session_id()
@@ -43,6 +48,7 @@ class ChatIngestor:
             
             self.temp_dir = self._resolve_dir(self.temp_base) # Here _resolve_dir function will explain later under this class
             self.faiss_dir = self._resolve_dir(self.faiss_base) # This folder will be passsed and used when call object of class FaissManager to load or create vector store
+            self.saved_paths: List[Path] = [] # Raw uploads of the last built_in_retrieval call (can be deleted once indexed)
             
             log.info (f"Chat Ingestor Initialized", 
                     session_id= self.session_id,
@@ -73,7 +79,9 @@ class ChatIngestor:
 
     def _split(self, docs:List[Document], chunk_size=1000, chunk_overlap=200):
         """This Function Split Documents into small chunks that will be used by bulit_in_retrieval function later"""
-        splitter= RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        # start_index tells identical chunks of one page apart (see FaissManager._fingerprint)
+        splitter= RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True)
         chunks= splitter.split_documents(docs)
         log.info ("Documents splitted into chunks", chunks=len(chunks), chunk_size=chunk_size)
         return chunks
@@ -88,6 +96,7 @@ class ChatIngestor:
 
         try:
             paths= save_uploaded_files (uploaded_files, self.temp_dir) #Here self.temp_dir==target_dir:Path 
+            self.saved_paths = paths
             docs= load_documents(paths)
             if not docs:
                 raise ValueError("No Valid Document Loaded")
@@ -100,13 +109,11 @@ class ChatIngestor:
             meta_data = [c.metadata for c in chunks]
 
             #Lets Load Object of class FaissManager
-            fm = FaissManager(self.faiss_dir, self.model_loader) 
+            fm = FaissManager(self.faiss_dir, self.model_loader, vector_format=self._vector_format()) 
             #Here self.faiss_dir ==self.index_dir that is described in class FaissManager
-            try:
-                vs = fm.load_or_create (texts=texts, metadatas=meta_data)
-            except Exception:
+            with fm.writing():  # one writer per session index across workers; publishes a new snapshot
                 vs = fm.load_or_create (texts=texts, metadatas=meta_data)
-            added = fm.add_docs(chunks)
+                added = fm.add_docs(chunks)
             log.info("FAISS index updated", added=added, index=str(self.faiss_dir))
             return vs.as_retriever(search_type="similarity", search_kwargs={"k": 5})
         
@@ -114,6 +121,60 @@ class ChatIngestor:
             log.error("Failed to build retriever", error=str(e))
             raise DocumentPortalException("Failed to build retriever", e) from e
 
+    def _vector_format(self) -> VectorFormat:
+        """Vector format for new session indexes, from `vector_store` in configuration.yaml"""
+        return VectorFormat.from_dict((getattr(self.model_loader, "config", None) or {}).get("vector_store"))
+
+    def list_documents(self) -> Dict[str, int]:
+        """Sources in this session's index with their chunk counts"""
+        return list_indexed_documents(self.faiss_dir, self.model_loader)
+
+    def _upload_of(self, source:str) -> Optional[Path]:
+        """Raw upload behind an indexed source, if it is stored in this session's upload dir"""
+        p= Path(source)
+        return p if p.parent.resolve() == Path(self.temp_dir).resolve() else None
+
+    def delete_document(self, source:str) -> int:
+        """Remove one source file from this session's index without rebuilding it, and its raw upload"""
+        try:
+            fm = FaissManager(self.faiss_dir, self.model_loader)
+            with fm.writing():
+                fm.load_or_create()
+                removed= fm.delete_source(source)
+            upload= self._upload_of(source)
+            if upload is not None:
+                upload.unlink(missing_ok=True)  # the uploaded bytes go with the document
+                log.info("Raw upload deleted", path=str(upload))
+            return removed
+        except Exception as e:
+            log.error("Failed to delete document", error=str(e), source=source)
+            raise DocumentPortalException("Failed to delete document", e) from e
+
+    def replace_document(self, source:str, uploaded_file, *, chunk_size=1000, chunk_overlap=200) -> Dict[str, int]:
+        """Replace one source file in this session's index with a new upload.
+        Only the chunks whose content changed are embedded again (see FaissManager.replace_source)"""
+        try:
+            paths= save_uploaded_files([uploaded_file], self.temp_dir)
+            self.saved_paths = paths
+            docs= load_documents(paths)
+            if not docs:
+                raise ValueError("No Valid Document Loaded")
+            chunks= self._split(docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+            fm = FaissManager(self.faiss_dir, self.model_loader)
+            with fm.writing():
+                fm.load_or_create()
+                stats= fm.replace_source(source, chunks)
+            upload= self._upload_of(source)
+            if upload is not None:
+                # chunks keep `source` as their path, so it takes the new bytes and the superseded file goes
+                os.replace(paths[0], upload)
+                self.saved_paths = [upload]
+            return stats
+        except Exception as e:
+            log.error("Failed to replace document", error=str(e), source=source)
+            raise DocumentPortalException("Failed to replace document", e) from e
+
 
 
 
@@ -169,14 +230,36 @@ def save_uploaded_files (uploaded_files:Iterable, target_dir:Path) ->List[Path]:
             log.error("Failed to save uploaded files", error=str(e), dir=str(target_dir))
             raise DocumentPortalException("Failed to save uploaded files", e) from e
 
-def load_documents (paths: Iterable[Path]) -> List[Document]:
+def list_indexed_documents(index_dir:Path, model_loader:Optional[ModelLoader]= None) -> Dict[str, int]:
+    """Source -> chunk count of an index, read from its manifest without loading the vectors
+    (indexes written before the manifest had a source map are loaded once to rebuild it)"""
+    sources= FaissManager.read_sources(Path(index_dir))
+    if sources is not None:
+        return sources
+    fm = FaissManager(Path(index_dir), model_loader)
+    fm.load_or_create()
+    return fm.list_sources()
+
+def load_documents (paths: Iterable[Path], cache: Optional[ParsedTextCache] = None) -> List[Document]:
      # Here Document is Class for storing a piece of text and associated metadata
      #from langchain_core.documents import Document
-    """Load docs using appropriate loader based on extension."""
+    """Load docs using appropriate loader based on extension.
+    Files already parsed once (same bytes, same parser version) come from the parse cache
+    (cache, or the shared one from get_parse_cache() when not given)."""
     docs:List[Document]=[]
+    cache = cache or get_parse_cache()
     try:
+        from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
         for j in paths:
             ext = j.suffix.lower()
+            sha = None
+            if cache is not None and ext in Supported_Extensions:
+                sha = file_sha256(j)
+                cached = cache.get(j, sha)
+                if cached is not None:
+                    log.info("Parsed text served from cache", path=str(j), pages=len(cached))
+                    docs.extend(cached)
+                    continue
             if ext == ".pdf":
                 loader = PyPDFLoader(str(j))
             elif ext == ".docx":
@@ -186,7 +269,13 @@ def load_documents (paths: Iterable[Path]) -> List[Document]:
             else:
                 log.warning("Unsupported extension skipped", path=str(j))
                 continue
-            docs.extend(loader.load())
+            loaded = loader.load()
+            if sha is not None:
+                try:
+                    cache.put(j, loaded, sha)
+                except OSError as e:
+                    log.warning("Parse cache write failed", path=str(j), error=str(e))
+            docs.extend(loaded)
         log.info("Documents loaded", count=len(docs))
         return docs
 
@@ -198,78 +287,312 @@ def load_documents (paths: Iterable[Path]) -> List[Document]:
 
 
 class FaissManager:
-    def __init__(self, index_dir: Path, model_loader: Optional[ModelLoader]= None):
+    """Owns one FAISS index directory and its ingested_meta.json manifest.
+
+    The manifest maps every source file to the vector ids of its chunks and their content hashes:
+
+        {"rows":    {"<source> :: <row_id or content sha256>": "<vector id>"},
+         "sources": {"<source>": {"<vector id>": "<content sha256>"}},
+         "facets":  {"page" | "file_type": {"<value>": ["<vector id>", ...]}}}
+
+    which is what lets a single document be deleted or replaced without rebuilding the index.
+    Each snapshot also gets facets.json (utils/metadata_filter.py): the same source/page/file
+    type sets as FAISS positions, used to restrict filtered queries to the matching chunks.
+
+    vector_format (see utils/vector_compression.py) opts a new index into fp16/int8 storage,
+    reduced dimensionality and full-precision rescoring; an existing index keeps the format
+    recorded in its manifest.
+
+    Every save publishes a new immutable snapshot (utils/index_store.py). Writers should run
+    inside writing(), which serializes them across processes and reloads the latest version.
+    """
+    def __init__(self, index_dir: Path, model_loader: Optional[ModelLoader]= None,
+                 vector_format: Optional[VectorFormat]= None):
         self.index_dir= Path(index_dir)
         self.index_dir.mkdir(exist_ok= True)
-        self.meta_path= self.index_dir/"ingested_meta.json"
-        self._meta:Dict[str:Any]= {"rows":{}}
-
+        self.store= IndexSnapshotStore(self.index_dir)
+        self._requested_format= vector_format
+        self.model_loader= model_loader or get_model_loader()
+        self._base_emb= self.model_loader.load_embeddings()
+        self._read_meta()
+        self.vs: Optional["FAISS"]= None
+        self.full_vectors: Optional[FullVectorStore]= None  # only with vector_format.rescore
+
+    @property
+    def meta_path(self) -> Path:
+        return self.read_dir/"ingested_meta.json"
+
+    def _read_meta(self) -> None:
+        """Pin the live snapshot and read its manifest"""
+        self.read_dir= self.store.current_path()
+        self._meta:Dict[str,Any]= {"rows":{}, "sources":{}, "facets":{}}
         if self.meta_path.exists():
             try:
-                text=self.meta_path.read_text (encoding= "utf-8")  or {"rows":{}} #It covert all meta data in Python Dictionary form
-                self._meta= json.load(text) 
-
+                self._meta= json.loads(self.meta_path.read_text(encoding= "utf-8") or "{}") #It covert all meta data in Python Dictionary form
             except Exception:
-                self._meta={"rows:{}"} #init the Empty One if it does not exist
-
-        self.model_loader= model_loader or ModelLoader()
-        self.emb = self.model_loader.load_embeddings()
-        self.vs: Optional[FAISS]= None
+                self._meta={} #init the Empty One if it is unreadable
+        self._meta.setdefault("rows", {})
+        self._meta.setdefault("sources", {})
+        self._has_facets= "facets" in self._meta
+        self._meta.setdefault("facets", {})
+        if "vector_format" in self._meta:
+            self.vector_format= VectorFormat.from_dict(self._meta["vector_format"])
+        elif self._exist():
+            self.vector_format= VectorFormat()  # index written before formats were recorded: flat float32
+        else:
+            self.vector_format= self._requested_format or VectorFormat()
+        self.emb = wrap_embeddings(self._base_emb, self.vector_format)
+
+    @contextmanager
+    def writing(self) -> Iterator["FaissManager"]:
+        """Exclusive write access to this index (flock, so also across uvicorn workers).
+        State is reloaded from the latest snapshot once the lock is held."""
+        with self.store.write_lock():
+            self._read_meta()
+            self.vs= None
+            self.full_vectors= None
+            yield self
 
     def _exist(self) -> bool:
-        return (self.index_dir / "index.faiss").exists() and  (self.index_dir / "index.pkl").exists()
+        return (self.read_dir / "index.faiss").exists() and  (self.read_dir / "index.pkl").exists()
     
     @staticmethod
-    def _fingerprint (text:str, md:Dict[str,Any])-> str:
+    def _content_hash(text:str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _source(md:Dict[str,Any]) -> Optional[str]:
         src= md.get ("source") or md.get("file_path")
+        return None if src is None else str(src)
+
+    @staticmethod
+    def _fingerprint (text:str, md:Dict[str,Any])-> str:
+        src= FaissManager._source(md)
         rid=  md.get("row_id")
         if src is not None:
-            return f"{src} :: {'' if rid is None else rid}"
-        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+            if rid is not None:
+                return f"{src} :: {rid}"  # tabular sources
+            # page and offset keep identical text at different places of one file as separate chunks
+            where= "".join(f"{k}={md[k]} :: " for k in ("page", "start_index") if md.get(k) is not None)
+            return f"{src} :: {where}{FaissManager._content_hash(text)}"
+        return FaissManager._content_hash(text)
     
-    def save_meta(self):
+    def save_meta(self, target_dir:Optional[Path]= None):
         #This is Converted Python Dictionary In JSON FORMAT 
-        return self.meta_path.write_text(json.dumps(self._meta, indent=2, ensure_ascii = False),encoding="utf-8")
+        path= (Path(target_dir) if target_dir else self.read_dir)/"ingested_meta.json"
+        return path.write_text(json.dumps(self._meta, indent=2, ensure_ascii = False),encoding="utf-8")
+
+    def _save(self):
+        """Write index, vectors and manifest into a fresh snapshot and publish it atomically"""
+        snapshot= self.store.new_snapshot_dir()
+        try:
+            self.vs.save_local(str(snapshot))
+            if self.full_vectors is not None:
+                self.full_vectors.save(snapshot)
+            self._meta["vector_format"] = self.vector_format.to_dict()
+            self.save_meta(snapshot)
+            id_sets= {"source": self._meta["sources"], **self._meta["facets"]}
+            FacetIndex.from_ids(id_sets, self.vs.index_to_docstore_id).save(snapshot)
+            self.store.commit(snapshot)
+        except Exception:
+            shutil.rmtree(snapshot, ignore_errors=True)
+            raise
+        self.read_dir= self.store.current_path()
+
+    def _embed(self, texts:List[str]):
+        import numpy as np
+        return np.asarray(self.emb.embed_documents(texts), dtype=np.float32)
+
+    def _add(self, docs:List[Document], ids:List[str]) -> None:
+        """Embed and add docs under the given vector ids (keeps the full-precision copy in step)"""
+        vectors= self._embed([d.page_content for d in docs])
+        self.vs.add_embeddings(list(zip([d.page_content for d in docs], vectors.tolist())),
+                               metadatas=[d.metadata for d in docs], ids=ids)
+        if self.full_vectors is not None:
+            self.full_vectors.add(ids, vectors)
+        self._quantize()
+
+    def _quantize(self) -> None:
+        """Switch to the configured codec; int8 waits until there are min_train vectors to fit its ranges"""
+        if self.vector_format.codec == "flat":
+            return
+        index= quantize_index(self.vs.index, self.vector_format.codec, self.vector_format.min_train)
+        if index is not self.vs.index:
+            log.info("Index quantized", index=str(self.index_dir), codec=self.vector_format.codec, vectors=index.ntotal)
+            self.vs.index= index
+
+    def _delete(self, ids:List[str]) -> None:
+        self.vs.delete(ids)   # removes the vectors and docstore entries and compacts the id mapping
+        if self.full_vectors is not None:
+            self.full_vectors.remove(ids)
+
+    def _record(self, doc_id:str, text:str, md:Dict[str,Any]) -> None:
+        self._meta["rows"][self._fingerprint(text, md)] = doc_id
+        src= self._source(md)
+        if src is not None:
+            self._meta["sources"].setdefault(src, {})[doc_id] = self._content_hash(text)
+        for field, value in facet_values(md).items():
+            if field != "source":  # the source sets are self._meta["sources"]
+                self._meta["facets"].setdefault(field, {}).setdefault(value, []).append(doc_id)
+
+    def _ensure_id_map(self) -> None:
+        """Rebuild the per-source id map (and facets) from the docstore for indexes written before they existed"""
+        if (self._meta["sources"] and self._has_facets) or self.vs is None:
+            return
+        self._meta["rows"], self._meta["sources"], self._meta["facets"] = {}, {}, {}
+        self._has_facets= True
+        for doc_id in self.vs.index_to_docstore_id.values():
+            doc= self.vs.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                self._record(doc_id, doc.page_content, doc.metadata or {})
+        if self._meta["sources"]:
+            # persisted with the next snapshot; published versions are never rewritten in place
+            log.info("Rebuilt FAISS id map", sources=len(self._meta["sources"]), index=str(self.index_dir))
     
     def add_docs(self, docs:List[Document]):
         if self.vs is None:
             raise RuntimeError("Call load or create before add_document_idempotent().")
         new_docs: List[Document] = []
+        new_ids: List[str] = []
         for d in docs:
             key= self._fingerprint(d.page_content, d.metadata or {})
-            # d will iterate in self._meta["rows"] and check in "rows" inside ingested_meta.json.
-            # if rows inside ingested_meta.json, already have source_id with respect to Row ID, it will skip to enter
-            # If rows inside ingested_meta.json, doesnt have source_id with respect to Row ID, it will add that "key"(variable) or "d in docs" in row = True
-            # After added that key (Assigned variable of 'd in docs'):::: d will be append or added in new_docs (Initialize earlier)
+            # Every chunk is keyed by its source and content (or row_id) in self._meta["rows"] (ingested_meta.json).
+            # If the key is already there the chunk is already in the index and is skipped,
+            # otherwise it gets a new vector id that is recorded for its source (see _record)
             
             if key in self._meta["rows"]:
                 continue
-            self._meta["rows"][key] = True
+            doc_id= uuid.uuid4().hex
+            self._record(doc_id, d.page_content, d.metadata or {})
             new_docs.append(d)
+            new_ids.append(doc_id)
 
         if new_docs:
-            self.vs.add_documents (new_docs)  ### This add_documents is the Internal Method of Vector Store
-            self.vs.save_local(str(self.index_dir))
-            self.save_meta ()
-            return len (new_docs)
+            self._add(new_docs, new_ids)
+            self._save()
+        return len (new_docs)
+
+    @staticmethod
+    def read_sources(index_dir:Path) -> Optional[Dict[str, int]]:
+        """Source -> chunk count from the live manifest alone (None if it has no source map)"""
+        path= IndexSnapshotStore(index_dir).current_path()/"ingested_meta.json"
+        try:
+            meta= json.loads(path.read_text(encoding="utf-8") or "{}")
+        except (FileNotFoundError, ValueError):
+            return None
+        sources= meta.get("sources")
+        return {src: len(ids) for src, ids in sources.items()} if sources else None
+
+    def list_sources(self) -> Dict[str, int]:
+        """Source -> number of chunks in the index"""
+        return {src: len(ids) for src, ids in self._meta["sources"].items()}
+
+    def _forget(self, ids:Iterable[str]) -> None:
+        gone= set(ids)
+        self._meta["rows"] = {k: v for k, v in self._meta["rows"].items() if v not in gone}
+        for field, values in self._meta["facets"].items():
+            kept= {value: [i for i in members if i not in gone] for value, members in values.items()}
+            self._meta["facets"][field] = {value: members for value, members in kept.items() if members}
+
+    def delete_source(self, source:str) -> int:
+        """Remove every chunk of one source file from the index; returns the number of vectors removed"""
+        if self.vs is None:
+            raise RuntimeError("Call load or create before delete_source().")
+        ids= list(self._meta["sources"].get(source, {}))
+        if not ids:
+            return 0
+        self._delete(ids)
+        self._forget(ids)
+        del self._meta["sources"][source]
+        self._save()
+        log.info("Document deleted from FAISS index", source=source, removed=len(ids), index=str(self.index_dir))
+        return len(ids)
+
+    def replace_source(self, source:str, docs:List[Document]) -> Dict[str, int]:
+        """Replace the chunks of one source with docs, re-embedding only chunks whose content changed.
+
+        Unchanged chunks keep their vectors (their metadata is refreshed in the docstore),
+        chunks that disappeared are removed and new or modified chunks are embedded and added.
+        """
+        if self.vs is None:
+            raise RuntimeError("Call load or create before replace_source().")
+        old= dict(self._meta["sources"].get(source, {}))
+        by_hash: Dict[str, List[str]] = {}
+        for doc_id, h in old.items():
+            by_hash.setdefault(h, []).append(doc_id)
+
+        kept: Dict[str, Document] = {}
+        to_add: List[Document] = []
+        for d in docs:
+            md= dict(d.metadata or {}, source=source)
+            pool= by_hash.get(self._content_hash(d.page_content))
+            if pool:
+                kept[pool.pop()] = Document(page_content=d.page_content, metadata=md)
+            else:
+                to_add.append(Document(page_content=d.page_content, metadata=md))
+        removed= [doc_id for ids in by_hash.values() for doc_id in ids]
+
+        if removed:
+            self._delete(removed)
+        if kept:
+            self.vs.docstore.delete(list(kept))
+            self.vs.docstore.add({doc_id: Document(id=doc_id, page_content=d.page_content, metadata=d.metadata)
+                                  for doc_id, d in kept.items()})
+
+        self._forget(old)
+        self._meta["sources"].pop(source, None)
+        for doc_id, d in kept.items():
+            self._record(doc_id, d.page_content, d.metadata)
+        new_ids= [uuid.uuid4().hex for _ in to_add]
+        for doc_id, d in zip(new_ids, to_add):
+            self._record(doc_id, d.page_content, d.metadata)
+        if to_add:
+            self._add(to_add, new_ids)
+        self._save()
+
+        stats= {"kept": len(kept), "added": len(to_add), "removed": len(removed)}
+        log.info("Document replaced in FAISS index", source=source, index=str(self.index_dir), **stats)
+        return stats
         
     def load_or_create (self, texts: Optional[List[str]]=None, metadatas: Optional[List[dict]] = None):
+        from langchain_community.vectorstores import FAISS
          ## if we running first time then it will not go in this block
         if self._exist():
             self.vs=FAISS.load_local (
-                str(self.index_dir),
+                str(self.read_dir),
                 embeddings=self.emb,
                 allow_dangerous_deserialization=True
             )
+            if self.vector_format.rescore:
+                self.full_vectors= FullVectorStore.load(self.read_dir, mmap=False)
+            self._ensure_id_map()
             return self.vs
         if not texts:
             raise DocumentPortalException (f"No Existing FAISS files and No Data to create one", sys)
         
-        self.vs= FAISS.from_texts (
-            texts=texts,    
+        metadatas= metadatas or [{} for _ in texts]
+        self._meta= {"rows":{}, "sources":{}, "facets":{}}
+        ids= []
+        for text, md in zip(texts, metadatas):
+            key= self._fingerprint(text, md)
+            doc_id= self._meta["rows"].get(key) or uuid.uuid4().hex
+            if key not in self._meta["rows"]:
+                self._record(doc_id, text, md)
+            ids.append(doc_id)
+        # Duplicate chunks within the batch are embedded once
+        unique= {doc_id: (text, md) for doc_id, text, md in zip(ids, texts, metadatas)}
+        unique_texts= [t for t, _ in unique.values()]
+        vectors= self._embed(unique_texts)
+        self.vs= FAISS.from_embeddings (
+            text_embeddings=list(zip(unique_texts, vectors.tolist())),    
             embedding=self.emb,
-            metadatas=metadatas or []
+            metadatas=[m for _, m in unique.values()],
+            ids=list(unique),
         )
-        self.vs.save_local(str(self.index_dir))
+        self._quantize()
+        if self.vector_format.rescore:
+            self.full_vectors= FullVectorStore(list(unique), vectors)
+        if not self.vector_format.is_default:
+            log.info("Compressed vector format in use", index=str(self.index_dir), **self.vector_format.to_dict())
+        self._save()
         return self.vs
-   
\ No newline at end of file
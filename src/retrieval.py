@@ -1,13 +1,20 @@
 import sys
 import os
+import asyncio
+import inspect
 from operator import itemgetter
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
 from langchain_core.messages import BaseMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.vectorstores import FAISS
 
-from utils.model_loader import ModelLoader
+from utils.model_loader import ModelLoader, get_model_loader
+from utils.index_cache import index_cache, LoadedIndex
+from utils.vector_compression import FullVectorStore, exact_scores, rescore_order
+from utils.metadata_filter import normalize_filters
 from exceptions.custom_exception import DocumentPortalException
 from logger import global_logger as log
 from prompts.prompt import PromptRegistry
@@ -16,6 +23,78 @@ from langchain_core.runnables import RunnableLambda
 
 from model.models import PromptType
 
+
+def embed_queries(embeddings, questions: Sequence[str]) -> np.ndarray:
+     """Embed many queries in one batched call (query task type where the provider has one)"""
+     base = getattr(embeddings, "base", embeddings)  # see ReducedEmbeddings
+     params = inspect.signature(base.embed_documents).parameters
+     if "task_type" in params:
+          vectors = embeddings.embed_documents(list(questions), task_type="RETRIEVAL_QUERY")
+     else:
+          vectors = embeddings.embed_documents(list(questions))
+     return np.asarray(vectors, dtype=np.float32)
+
+
+def search_vectors(vectorstore, queries: np.ndarray, k: int = 5,
+                   full_vectors: Optional[FullVectorStore] = None, oversample: int = 4,
+                   subset: Optional[np.ndarray] = None) -> List[List[Tuple[Document, float]]]:
+     """One FAISS search over the whole query matrix; same scores as FAISS.similarity_search_with_score.
+
+     With full_vectors (compressed index + rescore), k * oversample candidates are fetched from
+     the quantized index and re-ranked with their full-precision vectors.
+     subset (FAISS positions, see FacetIndex.select) restricts the search itself to those vectors
+     through an IDSelector, so only they are scored.
+     """
+     import faiss
+
+     queries = np.ascontiguousarray(queries, dtype=np.float32)
+     if subset is not None and not len(subset):
+          return [[] for _ in range(len(queries))]
+     if getattr(vectorstore, "_normalize_L2", False):
+          faiss.normalize_L2(queries)
+     fetch = k * max(1, oversample) if full_vectors is not None else k
+     if subset is not None:
+          fetch = min(fetch, len(subset))
+          params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(np.ascontiguousarray(subset, dtype=np.int64)))
+          scores, indices = vectorstore.index.search(queries, fetch, params=params)
+     else:
+          scores, indices = vectorstore.index.search(queries, fetch)
+     results: List[List[Tuple[Document, float]]] = []
+     for query, row_scores, row_ids in zip(queries, scores, indices):
+          doc_ids = [vectorstore.index_to_docstore_id[int(i)] for i in row_ids if i != -1]
+          row = [float(x) for x, i in zip(row_scores, row_ids) if i != -1]
+          if full_vectors is not None and doc_ids:
+               doc_ids = [d for d in doc_ids if d in full_vectors]
+               exact = exact_scores(query, full_vectors.get(doc_ids), vectorstore.index.metric_type)
+               order = rescore_order(exact, vectorstore.index.metric_type, k)
+               doc_ids, row = [doc_ids[j] for j in order], [float(exact[j]) for j in order]
+          hits = []
+          for doc_id, score in zip(doc_ids, row):
+               doc = vectorstore.docstore.search(doc_id)
+               if isinstance(doc, Document):
+                    hits.append((doc, score))
+          results.append(hits)
+     return results
+
+
+class IndexRetriever(BaseRetriever):
+     """Retriever over a LoadedIndex through search_vectors (used when the index needs rescoring
+     or the query is restricted by metadata filters)"""
+     index: Any
+     k: int = 5
+     filters: Optional[Dict[str, List[str]]] = None
+
+     def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+          queries = np.asarray([self.index.embeddings.embed_query(query)], dtype=np.float32)
+          hits = search_vectors(self.index.vectorstore, queries, self.k,
+                                full_vectors=self.index.full_vectors, oversample=self.index.vector_format.oversample,
+                                subset=_subset(self.index, self.filters))
+          return [doc for doc, _ in hits[0]]
+
+
+def _subset(index: LoadedIndex, filters: Optional[Dict[str, List[str]]]) -> Optional[np.ndarray]:
+     return index.facets.select(filters) if filters and index.facets is not None else None
+
 class ConversationalRag: 
     
     #LCEL-based Conversational RAG with lazy retriever initialization.
@@ -25,10 +104,10 @@ class ConversationalRag:
 #         rag.load_retriever_from_faiss(index_path="faiss_index/abc", k=5, index_name="index") 
 #         answer = rag.invoke("What is ...?", chat_history=[])
     
-    def __init__(self, session_id : Optional[str], retriever=None):
+    def __init__(self, session_id : Optional[str], retriever=None, model_loader: Optional[ModelLoader] = None):
             try:
                   self.session_id=session_id
-                  self.model_loader= ModelLoader()
+                  self.model_loader= model_loader or get_model_loader()
 
                   self.llm= self.model_loader.load_llm()
                   if not self.llm:
@@ -39,7 +118,10 @@ class ConversationalRag:
 
             # Lazy Pieces
                   self.retriever= retriever
+                  self.index: Optional[LoadedIndex] = None
+                  self.vectorstore = None
                   self.chain = None
+                  self.answer_chain = None
                   if self.retriever is not None:
                         self._build_lcel_chain()
                   #log.info("Coversational RAG Initilaized", session_id=self.session_id)
@@ -52,27 +134,31 @@ class ConversationalRag:
       
     def load_retriever_from_faiss (self, index_path: str, k: int = 5, index_name: str = "index", 
                                    search_type: str = "similarity",
-                                     search_kwargs: Optional[Dict[str,Any]] = None,):
+                                     search_kwargs: Optional[Dict[str,Any]] = None,
+                                   filters: Optional[Dict[str, Any]] = None):
         
-        """Load FAISS vectorstore from disk and build retriever + LCEL chain."""
+        """Load FAISS vectorstore from disk and build retriever + LCEL chain.
+        filters ({"source" | "page" | "file_type": value or [values]}) restrict the search to
+        matching chunks (see utils/metadata_filter.py)."""
              
         try:
               if not os.path.isdir(index_path):
                    raise FileNotFoundError (f"FAISS Index directory not found: {index_path}")
               embeddings = self.model_loader.load_embeddings()
-              vectorstore = FAISS.load_local(
-                   index_path,
-                   embeddings = embeddings,
-                   index_name = index_name,
-                   allow_dangerous_deserialization = True, # ok if you trust the index
-
-              )
+              # Served from the in-process cache when the index on disk has not changed
+              self.index = index_cache.get(index_path, embeddings, index_name=index_name)
+              vectorstore = self.index.vectorstore
 
+              self.vectorstore = vectorstore
               if search_kwargs is None:
                    search_kwargs= {"k": k}
-              self.retriever = vectorstore.as_retriever(
-                   search_type=search_type, search_kwargs=search_kwargs
-              )
+              filters = normalize_filters(filters)
+              if (self.index.full_vectors is not None or filters) and search_type == "similarity":
+                   self.retriever = IndexRetriever(index=self.index, k=search_kwargs.get("k", k), filters=filters)
+              else:
+                   self.retriever = vectorstore.as_retriever(
+                        search_type=search_type, search_kwargs=search_kwargs
+                   )
               self._build_lcel_chain()
 
               log.info(
@@ -112,6 +198,29 @@ class ConversationalRag:
               log.error("Failed to invoke ConversationalRAG", error=str(e))
               raise DocumentPortalException("Invocation error in ConversationalRAG", sys)
          
+    async def ainvoke (self, user_input:str, chat_history : Optional[List[BaseMessage]] = None) -> str:
+         """Async invoke of the LCEL pipeline (lets a ProviderRouter hedge slow providers)"""
+         try:
+              if self.chain is None:
+                   raise DocumentPortalException(f"RAG chain Not initializa, call load_retriever_from_faiss(), before invoke", sys)
+              chat_history = chat_history or []
+              payload = {"input": user_input, "chat_history": chat_history}
+
+              answer = await self.chain.ainvoke(payload)
+
+              if not answer:
+                   log.warning("No Answer generated", user_input=user_input, session_id = self.session_id)
+              log.info(
+                "Chain invoked successfully",
+                session_id = self.session_id,
+                user_input = user_input,
+                answer_preview = str(answer)[:150],
+            )
+              return answer
+         except Exception as e:
+              log.error("Failed to invoke ConversationalRAG", error=str(e))
+              raise DocumentPortalException("Invocation error in ConversationalRAG", sys)
+         
     def load_llm(self):
          try:
             self.llm = self.model_loader.load_llm()
@@ -123,6 +232,45 @@ class ConversationalRag:
             log.error("Failed to load LLM", error=str(e))
             raise DocumentPortalException("LLM loading error in ConversationalRAG", sys)
     
+    def search_many(self, questions: Sequence[str], k: int = 5,
+                    filters: Optional[Dict[str, Any]] = None) -> List[List[Document]]:
+         """Retrieve top-k docs for many questions: one embedding call and one FAISS search"""
+         if self.index is None:
+              raise DocumentPortalException("No vectorstore loaded, call load_retriever_from_faiss() first", sys)
+         queries = embed_queries(self.index.embeddings, questions)
+         hits = search_vectors(self.index.vectorstore, queries, k, full_vectors=self.index.full_vectors,
+                               oversample=self.index.vector_format.oversample,
+                               subset=_subset(self.index, normalize_filters(filters)))
+         return [[doc for doc, _ in row] for row in hits]
+
+    async def abatch_invoke(self, questions: Sequence[str], k: int = 5, max_concurrency: int = 4,
+                            filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+         """Answer many independent questions against the loaded index.
+
+         Retrieval is shared (see search_many); answers are generated concurrently, at most
+         max_concurrency at a time, and returned in input order with a per-item error.
+         Each question is standalone (empty chat history), so the question-rewrite step is skipped.
+         """
+         if self.answer_chain is None:
+              raise DocumentPortalException("RAG chain Not initializa, call load_retriever_from_faiss(), before invoke", sys)
+         retrieved = await asyncio.to_thread(self.search_many, questions, k, filters)
+         sem = asyncio.Semaphore(max(1, max_concurrency))
+
+         async def answer(question: str, docs: List[Document]) -> Dict[str, Any]:
+              async with sem:
+                   try:
+                        out = await self.answer_chain.ainvoke(
+                             {"context": self._format_docs(docs), "input": question, "chat_history": []})
+                        return {"question": question, "answer": out, "error": None}
+                   except Exception as e:
+                        log.warning("Batch item failed", session_id=self.session_id, error=str(e))
+                        return {"question": question, "answer": None, "error": str(e)}
+
+         results = await asyncio.gather(*(answer(q, d) for q, d in zip(questions, retrieved)))
+         log.info("Batch invoked", session_id=self.session_id, questions=len(questions),
+                  errors=sum(1 for r in results if r["error"]))
+         return list(results)
+
     @staticmethod
     #For each doc d, extract its text content. If page_content does not exist, use the string version of the doc.
     def _format_docs(docs) -> str:
@@ -151,15 +299,14 @@ class ConversationalRag:
 
               # 3) Answer using retrieved context + original input + chat history
 
+              self.answer_chain = self.qa_prompt | self.llm | StrOutputParser()
               self.chain = ( 
                   {
                    "context": retrieve_docs,
                    "input": itemgetter("input"),
                    "chat_history": itemgetter("chat_history"),
                   }
-                  | self.qa_prompt
-                  | self.llm
-                  | StrOutputParser()
+                  | self.answer_chain
                )
 
               log.info("LCEL graph built successfully", session_id=self.session_id)
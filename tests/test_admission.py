@@ -0,0 +1,115 @@
+# tests/test_admission.py
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from utils.admission import AdmissionController, AdmissionRejected
+
+
+async def _hold(ctrl, release, session_id=None, log=None, tag=None, weight=1):
+    async with ctrl.slot(session_id, weight=weight):
+        if log is not None:
+            log.append(tag)
+        await release.wait()
+
+
+def test_limits_concurrency_and_admits_waiters_in_order():
+    async def main():
+        ctrl = AdmissionController("t", max_concurrent=2, max_queue=3)
+        release, order = asyncio.Event(), []
+        tasks = [asyncio.create_task(_hold(ctrl, release, log=order, tag=i)) for i in range(5)]
+        await asyncio.sleep(0.01)
+        m = ctrl.metrics()
+        assert (m["active"], m["queued"]) == (2, 3)
+        release.set()
+        await asyncio.gather(*tasks)
+        assert order == [0, 1, 2, 3, 4]
+        m = ctrl.metrics()
+        assert (m["active"], m["queued"], m["admitted"], m["max_queue_depth"]) == (0, 0, 5, 3)
+
+    asyncio.run(main())
+
+
+def test_weighted_slots_count_against_the_limit_in_order():
+    async def main():
+        ctrl = AdmissionController("t", max_concurrent=4, max_queue=4)
+        first, rest, order = asyncio.Event(), asyncio.Event(), []
+        batch = asyncio.create_task(_hold(ctrl, first, log=order, tag="batch", weight=3))
+        await asyncio.sleep(0.01)
+        waiting = [asyncio.create_task(_hold(ctrl, rest, log=order, tag="batch2", weight=2)),
+                   asyncio.create_task(_hold(ctrl, rest, log=order, tag="single"))]
+        await asyncio.sleep(0.01)
+        assert (ctrl.metrics()["active"], order) == (3, ["batch"])  # "single" fits but waits its turn
+
+        first.set()
+        await batch
+        await asyncio.sleep(0.01)
+        assert (ctrl.metrics()["active"], order) == (3, ["batch", "batch2", "single"])
+        rest.set()
+        await asyncio.gather(*waiting)
+        assert ctrl.metrics()["active"] == 0
+
+    asyncio.run(main())
+
+
+def test_rejects_when_queue_is_full_or_wait_times_out():
+    async def main():
+        ctrl = AdmissionController("t", max_concurrent=1, max_queue=1, queue_timeout_seconds=0.05)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(ctrl, release))
+        waiter = asyncio.create_task(_hold(ctrl, release))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(AdmissionRejected) as exc:
+            await _hold(ctrl, release)
+        assert exc.value.reason == "queue_full" and exc.value.retry_after >= 1
+
+        with pytest.raises(AdmissionRejected) as exc:
+            await waiter
+        assert exc.value.reason == "queue_timeout"
+
+        release.set()
+        await holder
+        assert ctrl.metrics()["rejected"] == {"queue_full": 1, "queue_timeout": 1, "session_limit": 0}
+
+    asyncio.run(main())
+
+
+def test_per_session_limit_and_cancelled_waiter_frees_its_place():
+    async def main():
+        ctrl = AdmissionController("t", max_concurrent=1, max_queue=2, max_per_session=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(ctrl, release, session_id="a"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as exc:
+            await _hold(ctrl, release, session_id="a")
+        assert exc.value.reason == "session_limit"
+
+        waiter = asyncio.create_task(_hold(ctrl, release, session_id="b"))
+        await asyncio.sleep(0.01)
+        waiter.cancel()  # client went away while queued
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert ctrl.metrics()["queued"] == 0
+
+        release.set()
+        await holder
+        await asyncio.wait_for(_hold(ctrl, release, session_id="b"), 1)
+        assert ctrl.metrics()["active"] == 0
+
+    asyncio.run(main())
+
+
+def test_api_returns_429_with_retry_after(monkeypatch):
+    import api.main as main
+
+    saturated = AdmissionController("query", max_concurrent=1, max_queue=0)
+    saturated._active = 1  # every slot busy
+    monkeypatch.setattr(main, "query_admission", saturated)
+
+    resp = TestClient(main.app).post("/chat/query", data={"question": "hi", "session_id": "s1"})
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert resp.json()["reason"] == "queue_full"
+
+    listing = TestClient(main.app).get("/chat/documents", params={"session_id": "s1"})
+    assert listing.status_code == 429
@@ -0,0 +1,47 @@
+# tests/test_batch_query.py
+
+import asyncio
+from src.data_ingestion import FaissManager
+from src.retrieval import ConversationalRag, embed_queries, search_vectors
+from utils.fake_models import FakeChatModel, FakeModelLoader
+
+TEXTS = ["cats purr and sleep", "dogs bark at night", "fish swim in water", "birds sing at dawn"]
+
+
+def _rag(tmp_path, llm=None):
+    loader = FakeModelLoader(llm=llm)
+    FaissManager(tmp_path / "s1", loader).load_or_create(texts=TEXTS, metadatas=[{"source": "zoo.txt"}] * 4)
+    rag = ConversationalRag(session_id="s1", model_loader=loader)
+    rag.load_retriever_from_faiss(str(tmp_path / "s1"), k=2)
+    return rag, loader
+
+
+def test_matrix_search_matches_single_query_search(tmp_path):
+    rag, loader = _rag(tmp_path)
+    questions = ["do dogs bark", "where do fish swim"]
+    batched = search_vectors(rag.vectorstore, embed_queries(loader.embeddings, questions), k=2)
+    for q, hits in zip(questions, batched):
+        single = rag.vectorstore.similarity_search_with_score(q, k=2)
+        assert [d.page_content for d, _ in hits] == [d.page_content for d, _ in single]
+
+
+def test_search_many_uses_one_embedding_call(tmp_path):
+    rag, loader = _rag(tmp_path)
+    before = loader.embeddings.calls
+    docs = rag.search_many(["cats", "dogs", "fish", "birds"], k=1)
+    assert loader.embeddings.calls - before == 1
+    assert [d[0].page_content for d in docs] == TEXTS
+
+
+def test_batch_returns_results_in_order_with_per_item_errors(tmp_path):
+    def reply(text):
+        if "boom" in text:
+            raise RuntimeError("provider exploded")
+        return text.upper()
+
+    rag, _ = _rag(tmp_path, llm=FakeChatModel(latency=(0.0, 0.02), reply=reply, seed=1))
+    results = asyncio.run(rag.abatch_invoke(["cats?", "boom", "dogs?"], k=1, max_concurrency=2))
+
+    assert [r["question"] for r in results] == ["cats?", "boom", "dogs?"]
+    assert [r["answer"] for r in results] == ["CATS?", None, "DOGS?"]
+    assert "provider exploded" in results[1]["error"]
@@ -0,0 +1,109 @@
+# tests/test_faiss_manager.py
+
+import io
+import json
+from langchain_core.documents import Document
+from src.data_ingestion import ChatIngestor, FaissManager
+from utils.fake_models import FakeModelLoader
+
+
+def _chunks(source, texts):
+    return [Document(page_content=t, metadata={"source": source}) for t in texts]
+
+
+def _index(tmp_path, loader):
+    fm = FaissManager(tmp_path / "idx", loader)
+    docs = _chunks("a.txt", ["alpha one", "alpha two", "alpha three"]) + _chunks("b.txt", ["beta one", "beta two"])
+    fm.load_or_create(texts=[d.page_content for d in docs], metadatas=[d.metadata for d in docs])
+    assert fm.add_docs(docs) == 0  # already recorded when the index was created
+    return fm
+
+
+def test_create_records_vector_ids_per_source(tmp_path):
+    fm = _index(tmp_path, FakeModelLoader())
+    assert fm.list_sources() == {"a.txt": 3, "b.txt": 2}
+    assert len(fm.vs.index_to_docstore_id) == 5
+    meta = json.loads(fm.meta_path.read_text())
+    assert set(meta["sources"]["b.txt"]) <= set(fm.vs.index_to_docstore_id.values())
+
+
+def test_delete_source_removes_vectors_and_manifest_entries(tmp_path):
+    loader = FakeModelLoader()
+    fm = _index(tmp_path, loader)
+
+    assert fm.delete_source("a.txt") == 3
+    reloaded = FaissManager(tmp_path / "idx", loader)
+    reloaded.load_or_create()
+    assert reloaded.list_sources() == {"b.txt": 2}
+    assert reloaded.vs.index.ntotal == 2
+    assert all(d.metadata["source"] == "b.txt" for d in reloaded.vs.similarity_search("alpha", k=2))
+    assert not any(k.startswith("a.txt") for k in json.loads(fm.meta_path.read_text())["rows"])
+
+
+def test_replace_source_only_embeds_changed_chunks(tmp_path):
+    loader = FakeModelLoader()
+    fm = _index(tmp_path, loader)
+    before = loader.embeddings.embedded
+
+    stats = fm.replace_source("a.txt", _chunks("upload_123.txt", ["alpha one", "alpha two", "alpha four"]))
+    assert stats == {"kept": 2, "added": 1, "removed": 1}
+    assert loader.embeddings.embedded - before == 1
+    assert fm.list_sources() == {"a.txt": 3, "b.txt": 2}
+    assert fm.vs.index.ntotal == 5
+    texts = {fm.vs.docstore.search(i).page_content for i in fm.vs.index_to_docstore_id.values()}
+    assert "alpha three" not in texts and "alpha four" in texts
+
+
+def test_legacy_index_without_id_map_is_rebuilt(tmp_path):
+    loader = FakeModelLoader()
+    fm = _index(tmp_path, loader)
+    fm.meta_path.write_text(json.dumps({"rows": {"a.txt :: ": True}}))
+
+    legacy = FaissManager(tmp_path / "idx", loader)
+    legacy.load_or_create()
+    assert legacy.list_sources() == {"a.txt": 3, "b.txt": 2}
+
+
+def test_identical_text_on_different_pages_stays_separate(tmp_path):
+    docs = [Document(page_content="Confidential - do not distribute", metadata={"source": "a.pdf", "page": p})
+            for p in (0, 1, 2)]
+    fm = FaissManager(tmp_path / "idx", FakeModelLoader())
+    fm.load_or_create(texts=[d.page_content for d in docs], metadatas=[d.metadata for d in docs])
+
+    assert fm.vs.index.ntotal == 3
+    assert sorted(d.metadata["page"] for d in fm.vs.docstore._dict.values()) == [0, 1, 2]
+    assert fm.add_docs(docs) == 0
+
+
+def test_documents_are_listed_from_the_manifest_without_loading_the_index(tmp_path):
+    from src.data_ingestion import list_indexed_documents
+
+    _index(tmp_path, FakeModelLoader())
+
+    class NoModels:
+        def load_embeddings(self):
+            raise AssertionError("listing must not load the index")
+
+    assert list_indexed_documents(tmp_path / "idx", NoModels()) == {"a.txt": 3, "b.txt": 2}
+
+
+def _upload(name, text):
+    f = io.BytesIO(text.encode("utf-8"))
+    f.name = name
+    return f
+
+
+def test_deleting_or_replacing_a_document_drops_its_superseded_upload(tmp_path):
+    ci = ChatIngestor(temp_base=str(tmp_path / "data"), faiss_base=str(tmp_path / "faiss_index"),
+                      session_id="s1", model_loader=FakeModelLoader())
+    ci.built_in_retrieval([_upload("handbook.txt", "paid leave accrues monthly"),
+                           _upload("notes.txt", "meeting notes about leave")])
+    sources = sorted(ci.list_documents())
+    handbook, notes = sources
+
+    ci.delete_document(handbook)
+    ci.replace_document(notes, _upload("notes.txt", "revised meeting notes"))
+
+    assert sorted(str(p) for p in (tmp_path / "data" / "s1").iterdir()) == [notes]
+    assert open(notes, encoding="utf-8").read() == "revised meeting notes"
+    assert sorted(ci.list_documents()) == [notes]
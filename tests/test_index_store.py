@@ -0,0 +1,124 @@
+# tests/test_index_store.py
+
+import os
+import shutil
+import time
+import multiprocessing as mp
+import threading
+from langchain_core.documents import Document
+from src.data_ingestion import FaissManager
+from utils.fake_models import FakeModelLoader
+from utils.index_cache import IndexCache
+from utils.index_store import IndexSnapshotStore
+
+
+def _writer(index_dir, worker, rounds):
+    for r in range(rounds):
+        fm = FaissManager(index_dir, FakeModelLoader())
+        texts = [f"worker {worker} round {r} chunk {i}" for i in range(3)]
+        metas = [{"source": f"w{worker}_r{r}.txt"}] * 3
+        with fm.writing():
+            fm.load_or_create(texts=texts, metadatas=metas)
+            fm.add_docs([Document(page_content=t, metadata=m) for t, m in zip(texts, metas)])
+
+
+def _numbers(store):
+    return sorted(p.name.split("-")[0] for p in store.versions_dir.iterdir())
+
+
+def test_each_save_publishes_a_new_version(tmp_path):
+    fm = FaissManager(tmp_path / "s", FakeModelLoader())
+    with fm.writing():
+        fm.load_or_create(texts=["a b c"], metadatas=[{"source": "a.txt"}])
+    version = fm.store.current_version()
+    assert version.startswith("v000001-")
+    assert (tmp_path / "s" / "versions" / version / "index.faiss").exists()
+    assert not (tmp_path / "s" / "index.faiss").exists()
+
+
+def test_old_versions_are_garbage_collected(tmp_path):
+    store = IndexSnapshotStore(tmp_path / "s", keep_versions=2, gc_grace_seconds=0)
+    for _ in range(4):
+        with store.write_lock():
+            store.commit(store.new_snapshot_dir())
+    assert _numbers(store) == ["v000003", "v000004"]
+    assert store.current_version().startswith("v000004-")
+
+
+def test_grace_period_runs_from_when_a_version_was_superseded(tmp_path):
+    store = IndexSnapshotStore(tmp_path / "s", keep_versions=1, gc_grace_seconds=60)
+    hour_ago = time.time() - 3600
+
+    def commit():
+        with store.write_lock():
+            store.commit(store.new_snapshot_dir())
+
+    commit()
+    first = store.versions_dir / store.current_version()
+    os.utime(first, (hour_ago, hour_ago))  # built long ago, live until now
+    commit()
+    assert first.is_dir()
+
+    os.utime(first / store.SUPERSEDED_MARKER, (hour_ago, hour_ago))
+    commit()
+    assert _numbers(store) == ["v000002", "v000003"]
+
+
+def test_rebuilt_session_is_not_served_from_a_stale_cache(tmp_path):
+    loader = FakeModelLoader()
+    cache = IndexCache(max_entries=2)
+
+    def build(text):
+        fm = FaissManager(tmp_path / "s", loader)
+        with fm.writing():
+            fm.load_or_create(texts=[text], metadatas=[{"source": "a.txt"}])
+
+    build("alpha old content")
+    assert cache.get(str(tmp_path / "s"), loader.embeddings).vectorstore.docstore._dict
+    shutil.rmtree(tmp_path / "s")  # evicted (or deleted by hand) without this cache hearing of it
+    build("beta new content")
+
+    loaded = cache.get(str(tmp_path / "s"), loader.embeddings)
+    assert [d.page_content for d in loaded.vectorstore.docstore._dict.values()] == ["beta new content"]
+
+
+def test_write_lock_lives_outside_the_index_directory(tmp_path):
+    store = IndexSnapshotStore(tmp_path / "s")
+    with store.write_lock():
+        store.commit(store.new_snapshot_dir())
+    assert store.lock_path.exists() and tmp_path / "s" not in store.lock_path.parents
+
+
+def test_concurrent_writer_processes_do_not_lose_updates(tmp_path):
+    index_dir = tmp_path / "s"
+    ctx = mp.get_context("fork")
+    procs = [ctx.Process(target=_writer, args=(index_dir, w, 4)) for w in range(3)]
+    loader = FakeModelLoader()
+    reads, errors, stop = [], [], threading.Event()
+
+    def reader():
+        cache = IndexCache(max_entries=2)
+        while not stop.is_set():
+            if IndexSnapshotStore(index_dir).current_version() is None:
+                continue
+            try:
+                loaded = cache.get(str(index_dir), loader.embeddings)
+                reads.append(loaded.vectorstore.index.ntotal)
+            except Exception as e:  # a torn read would surface here
+                errors.append(e)
+
+    t = threading.Thread(target=reader)
+    t.start()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    stop.set()
+    t.join()
+
+    fm = FaissManager(index_dir, loader)
+    fm.load_or_create()
+    assert len(fm.list_sources()) == 12
+    assert fm.vs.index.ntotal == 36
+    assert not errors
+    assert reads == sorted(reads)  # readers only ever move forward through versions
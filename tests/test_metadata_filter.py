@@ -0,0 +1,87 @@
+# tests/test_metadata_filter.py
+
+import pytest
+from langchain_core.documents import Document
+from src.data_ingestion import FaissManager
+from src.retrieval import ConversationalRag
+from utils.fake_models import FakeModelLoader
+from utils.index_cache import IndexCache
+from utils.metadata_filter import FacetIndex, normalize_filters
+
+DOCS = [
+    Document(page_content="leave policy accrual days", metadata={"source": "handbook_2024.pdf", "page": 0}),
+    Document(page_content="leave policy carry over", metadata={"source": "handbook_2024.pdf", "page": 1}),
+    Document(page_content="leave policy accrual days updated", metadata={"source": "handbook_2025.pdf", "page": 0}),
+    Document(page_content="leave policy parental weeks", metadata={"source": "handbook_2025.pdf", "page": 1}),
+    Document(page_content="leave notes from the meeting", metadata={"source": "notes.txt"}),
+]
+
+
+def _rag(tmp_path, loader):
+    fm = FaissManager(tmp_path / "s1", loader)
+    with fm.writing():
+        fm.load_or_create(texts=[d.page_content for d in DOCS], metadatas=[d.metadata for d in DOCS])
+    rag = ConversationalRag(session_id="s1", model_loader=loader)
+    rag.load_retriever_from_faiss(str(tmp_path / "s1"), k=3)
+    return rag, fm
+
+
+def test_filters_restrict_the_search_to_matching_chunks(tmp_path):
+    rag, _ = _rag(tmp_path, FakeModelLoader())
+
+    only_2025 = rag.search_many(["leave accrual days"], k=3, filters={"source": "handbook_2025.pdf"})[0]
+    assert {d.metadata["source"] for d in only_2025} == {"handbook_2025.pdf"} and len(only_2025) == 2
+
+    txt = rag.search_many(["leave accrual days"], k=3, filters={"file_type": ".TXT"})[0]
+    assert [d.metadata["source"] for d in txt] == ["notes.txt"]
+
+    page1 = rag.search_many(["leave"], k=3, filters={"source": ["handbook_2024.pdf", "handbook_2025.pdf"], "page": 1})[0]
+    assert sorted(d.page_content for d in page1) == ["leave policy carry over", "leave policy parental weeks"]
+
+    assert rag.search_many(["leave"], k=3, filters={"source": "missing.pdf"}) == [[]]
+
+
+def test_retriever_applies_filters(tmp_path):
+    loader = FakeModelLoader()
+    rag, _ = _rag(tmp_path, loader)
+    rag.load_retriever_from_faiss(str(tmp_path / "s1"), k=3, filters={"source": "notes.txt"})
+    assert [d.metadata["source"] for d in rag.retriever.invoke("leave policy")] == ["notes.txt"]
+
+
+def test_facet_positions_follow_deletes_and_legacy_indexes_are_derived(tmp_path):
+    loader = FakeModelLoader()
+    _, fm = _rag(tmp_path, loader)
+    with fm.writing():
+        fm.load_or_create()
+        fm.delete_source("handbook_2024.pdf")  # shifts the FAISS positions of every later chunk
+
+    loaded = IndexCache.load(fm.store.current_path(), loader.load_embeddings())
+    rows = loaded.facets.select(normalize_filters({"source": "handbook_2025.pdf"}))
+    sources = {loaded.vectorstore.docstore.search(loaded.vectorstore.index_to_docstore_id[int(i)]).metadata["source"]
+               for i in rows}
+    assert sources == {"handbook_2025.pdf"} and len(rows) == 2
+
+    (fm.store.current_path() / FacetIndex.FILE).unlink()  # index written before facets existed
+    legacy = IndexCache.load(fm.store.current_path(), loader.load_embeddings())
+    assert legacy.facets.values("file_type") == {"pdf": 2, "txt": 1}
+
+
+def test_filename_matches_the_uploaded_name_without_the_stored_suffix(tmp_path):
+    loader = FakeModelLoader()
+    docs = [("leave policy accrual days", "data/s2/handbook_2024_0a1b2c.pdf"),
+            ("leave policy accrual days updated", "data/s2/handbook_2025_1213ea.pdf"),
+            ("leave policy parental weeks", "data/s2/handbook_2025_1213ea.pdf")]
+    fm = FaissManager(tmp_path / "s2", loader)
+    with fm.writing():
+        fm.load_or_create(texts=[t for t, _ in docs], metadatas=[{"source": s} for _, s in docs])
+    rag = ConversationalRag(session_id="s2", model_loader=loader)
+    rag.load_retriever_from_faiss(str(tmp_path / "s2"), k=3)
+
+    hits = rag.search_many(["leave accrual days"], k=3, filters={"filename": "Handbook 2025.PDF"})[0]
+    assert {d.metadata["source"] for d in hits} == {"data/s2/handbook_2025_1213ea.pdf"} and len(hits) == 2
+    assert rag.index.facets.values("filename") == {"handbook_2024.pdf": 1, "handbook_2025.pdf": 2}
+
+
+def test_unknown_filter_field_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported filter field"):
+        normalize_filters({"author": "me"})
@@ -0,0 +1,78 @@
+# tests/test_parse_cache.py
+
+import os
+import time
+from langchain_community.document_loaders import TextLoader
+from src.data_ingestion import load_documents
+from utils import parse_cache
+from utils.parse_cache import ParsedTextCache
+
+
+def _count_parses(monkeypatch):
+    calls = []
+    original = TextLoader.load
+    monkeypatch.setattr(TextLoader, "load", lambda self: calls.append(self.file_path) or original(self))
+    return calls
+
+
+def test_repeat_upload_skips_parsing_and_repoints_source(tmp_path, monkeypatch):
+    calls = _count_parses(monkeypatch)
+    cache = ParsedTextCache(str(tmp_path / "cache"))
+    first, second = tmp_path / "a_111.txt", tmp_path / "a_222.txt"
+    first.write_text("same handbook text", encoding="utf-8")
+    second.write_text("same handbook text", encoding="utf-8")
+
+    load_documents([first], cache=cache)
+    docs = load_documents([second], cache=cache)
+
+    assert len(calls) == 1
+    assert docs[0].page_content == "same handbook text"
+    assert docs[0].metadata["source"] == str(second)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_parser_upgrade_invalidates_entries(tmp_path, monkeypatch):
+    calls = _count_parses(monkeypatch)
+    cache = ParsedTextCache(str(tmp_path / "cache"))
+    f = tmp_path / "doc.txt"
+    f.write_text("text", encoding="utf-8")
+
+    load_documents([f], cache=cache)
+    monkeypatch.setattr(parse_cache, "_version", lambda package: "next")
+    load_documents([f], cache=cache)
+    assert len(calls) == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ParsedTextCache(str(tmp_path / "cache"), max_bytes=10**9)
+    files = []
+    for i in range(3):
+        f = tmp_path / f"f{i}.txt"
+        f.write_text(f"document number {i} " * 50, encoding="utf-8")
+        load_documents([f], cache=cache)
+        files.append(f)
+    entries = sorted(cache._files(), key=lambda e: e[0].name)
+    for n, (p, _) in enumerate(entries):
+        os.utime(p, (time.time() - 100 + n, time.time() - 100 + n))
+    cache.get(files[0])  # refresh f0
+
+    cache.max_bytes = sum(st.st_size for _, st in cache._files()) - 1
+    assert cache.evict() == 1
+    assert cache.get(files[0]) is not None
+
+
+def test_overwriting_an_entry_does_not_count_it_twice(tmp_path):
+    cache = ParsedTextCache(str(tmp_path / "cache"))
+    f = tmp_path / "doc.txt"
+    f.write_text("text " * 100, encoding="utf-8")
+    docs = load_documents([f], cache=cache)
+    for _ in range(3):
+        cache.put(f, docs)
+    assert cache.metrics()["bytes"] == cache._scan_bytes()
+
+
+def test_shared_cache_lives_under_the_upload_root(tmp_path, monkeypatch):
+    monkeypatch.delenv("PARSE_CACHE_DIR", raising=False)
+    monkeypatch.setenv("UPLOAD_BASE", str(tmp_path / "uploads"))
+    monkeypatch.setattr(parse_cache, "_default_cache", None)
+    assert parse_cache.get_parse_cache().cache_dir == tmp_path / "uploads" / ".parse_cache"
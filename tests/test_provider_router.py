@@ -0,0 +1,78 @@
+# tests/test_provider_router.py
+
+import asyncio
+import pytest
+from exceptions.custom_exception import DocumentPortalException
+from src.data_ingestion import FaissManager
+from src.retrieval import ConversationalRag
+from utils.fake_models import FakeChatModel, FakeModelLoader
+from utils.model_loader import ProviderRouter
+
+
+def test_fails_over_to_next_provider_on_error():
+    google = FakeChatModel("google", error_rate=1.0)
+    groq = FakeChatModel("groq")
+    router = ProviderRouter({"google": google, "groq": groq})
+
+    assert router.invoke("hello").content == "[groq] hello"
+    assert router.stats["google"].errors == 1
+    assert router.stats["groq"].calls == 1
+
+
+def test_unhealthy_provider_is_moved_to_the_back():
+    router = ProviderRouter({"google": FakeChatModel("google", error_rate=1.0), "groq": FakeChatModel("groq")},
+                            min_error_samples=3, cooldown_seconds=60)
+    for _ in range(3):
+        router.invoke("q")
+    assert router.order() == ["groq", "google"]
+
+
+def test_all_providers_failing_raises():
+    router = ProviderRouter({"google": FakeChatModel("google", error_rate=1.0),
+                             "groq": FakeChatModel("groq", error_rate=1.0)})
+    with pytest.raises(DocumentPortalException):
+        router.invoke("q")
+
+
+def _warmed_router(google, groq):
+    router = ProviderRouter({"google": google, "groq": groq}, hedge_enabled=True, hedge_min_samples=5)
+    for _ in range(5):
+        router.stats["google"].record(0.1, ok=True)
+    return router
+
+
+def test_sync_invoke_never_sends_a_speculative_request():
+    groq = FakeChatModel("groq")
+    router = ProviderRouter({"google": FakeChatModel("google", latency=0.1), "groq": groq},
+                            hedge_enabled=True, hedge_min_samples=5)
+    for _ in range(5):
+        router.stats["google"].record(0.01, ok=True)  # the primary is far past its p95
+    assert router.invoke("q").content == "[google] q"
+    assert router.stats["google"].hedges == 0 and groq.calls == 0
+
+
+def test_async_hedge_cancels_the_loser():
+    google = FakeChatModel("google", latency=0.5)
+    router = _warmed_router(google, FakeChatModel("groq", latency=0.01))
+    out = asyncio.run(router.ainvoke("q"))
+    assert out.content == "[groq] q"
+    assert google.cancelled == 1
+
+
+def test_rag_ainvoke_goes_through_the_async_hedge(tmp_path):
+    google = FakeChatModel("google", latency=0.5)
+    loader = FakeModelLoader(llm=_warmed_router(google, FakeChatModel("groq", latency=0.01)))
+    fm = FaissManager(tmp_path / "s1", loader)
+    fm.load_or_create(texts=["paid leave accrues monthly"], metadatas=[{"source": "handbook.txt"}])
+    rag = ConversationalRag(session_id="s1", model_loader=loader)
+    rag.load_retriever_from_faiss(str(tmp_path / "s1"), k=1)
+
+    assert asyncio.run(rag.ainvoke("how does leave accrue?")).startswith("[groq]")
+    assert google.cancelled == 2  # question rewrite and answer both hedged
+
+
+def test_no_hedge_when_primary_is_fast():
+    groq = FakeChatModel("groq")
+    router = _warmed_router(FakeChatModel("google", latency=0.0), groq)
+    assert router.invoke("q").content == "[google] q"
+    assert groq.calls == 0
@@ -0,0 +1,42 @@
+# tests/test_replay.py
+
+import asyncio
+import json
+import httpx
+import pytest
+from benchmarks.replay import SAMPLE_LOG, inprocess_app, load_log, replay, summarize
+
+
+def _write_log(path, rows):
+    path.write_text("\n".join(json.dumps(r) for r in rows) + "\n")
+    return path
+
+
+def test_load_log_sorts_and_normalizes_timestamps(tmp_path):
+    log = _write_log(tmp_path / "t.jsonl", [
+        {"ts": "2025-10-20T08:00:02Z", "endpoint": "/chat/query", "session_id": "a", "question": "q?"},
+        {"ts": "2025-10-20T08:00:00Z", "endpoint": "/chat/index", "session_id": "a", "files": ["x.txt"]},
+    ])
+    events = load_log(log)
+    assert [(e.endpoint, e.offset) for e in events] == [("/chat/index", 0.0), ("/chat/query", 2.0)]
+
+    bad = _write_log(tmp_path / "bad.jsonl", [{"ts": 0, "endpoint": "/chat/query", "session_id": "a"}])
+    with pytest.raises(ValueError, match="needs a question"):
+        load_log(bad)
+
+
+def test_sample_log_replays_in_process_without_errors(tmp_path):
+    events = load_log(SAMPLE_LOG)
+
+    async def run(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://replay") as client:
+            return await replay(events, client, SAMPLE_LOG.parent / "files", speed=0, session_prefix="t-")
+
+    with inprocess_app(tmp_path) as app:
+        results, elapsed = asyncio.run(run(app))
+
+    report = summarize(results, elapsed)
+    assert report["all"]["requests"] == len(events)
+    assert report["all"]["statuses"] == {"200": len(events)}  # queries waited for their session's index
+    assert report["/chat/query"]["p50_ms"] is not None
+    assert (tmp_path / "faiss_index" / "t-hr-42").is_dir()
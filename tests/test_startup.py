@@ -0,0 +1,19 @@
+# tests/test_startup.py
+
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+LAZY_MODULES = ["langchain_google_genai", "langchain_groq", "fitz", "faiss",
+                "langchain_community.document_loaders", "langchain_community.vectorstores"]
+
+
+def test_api_import_does_not_load_providers_or_loaders():
+    code = (
+        "import sys, api.main\n"
+        f"print([m for m in {LAZY_MODULES!r} if m in sys.modules])"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
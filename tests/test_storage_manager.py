@@ -0,0 +1,107 @@
+# tests/test_storage_manager.py
+
+import os
+import time
+import fcntl
+import threading
+from utils.index_store import flocked
+from utils.storage_manager import SessionStorageManager
+
+
+def _make_session(tmp_path, sid, size, age):
+    for base in ("faiss_index", "data"):
+        d = tmp_path / base / sid
+        d.mkdir(parents=True)
+        (d / "blob").write_bytes(b"x" * size)
+    marker = tmp_path / "faiss_index" / sid / SessionStorageManager.ACCESS_MARKER
+    marker.touch()
+    t = time.time() - age
+    os.utime(marker, (t, t))
+
+
+def _manager(tmp_path, **kw):
+    return SessionStorageManager(upload_base=str(tmp_path / "data"), faiss_base=str(tmp_path / "faiss_index"),
+                                 min_idle_seconds=60, **kw)
+
+
+def test_ttl_evicts_idle_sessions_only(tmp_path):
+    _make_session(tmp_path, "old", 10, age=3600)
+    _make_session(tmp_path, "new", 10, age=120)
+    sm = _manager(tmp_path, ttl_seconds=600)
+
+    assert sm.sweep() == {"ttl": ["old"], "quota": []}
+    assert not (tmp_path / "data" / "old").exists()
+    assert (tmp_path / "faiss_index" / "new").exists()
+    assert sm.metrics()["evicted_ttl"] == 1
+
+
+def test_quota_evicts_least_recently_used_first(tmp_path):
+    _make_session(tmp_path, "a", 100, age=3000)
+    _make_session(tmp_path, "b", 100, age=2000)
+    _make_session(tmp_path, "c", 100, age=1000)
+    sm = _manager(tmp_path, max_bytes=250)
+
+    assert sm.sweep()["quota"] == ["a", "b"]
+    assert sm.metrics()["total_bytes"] <= 250
+
+
+def test_recently_touched_session_is_not_evicted(tmp_path):
+    _make_session(tmp_path, "busy", 100, age=3600)
+    sm = _manager(tmp_path, ttl_seconds=600, max_bytes=1)
+    sm.touch("busy")
+
+    assert sm.sweep() == {"ttl": [], "quota": []}
+
+
+def test_session_being_ingested_is_not_evicted(tmp_path):
+    _make_session(tmp_path, "uploading", 10, age=3600)
+    sm = _manager(tmp_path, ttl_seconds=600)
+
+    with sm.ingesting("uploading"):
+        assert sm.sweep() == {"ttl": [], "quota": []}
+        assert (tmp_path / "data" / "uploading" / "blob").exists()
+    assert sm.metrics()["skipped_busy"] == 1
+    assert sm.sweep()["ttl"] == ["uploading"]
+
+
+def test_snapshots_of_an_unsessioned_index_are_not_a_session(tmp_path):
+    base = tmp_path / "faiss_index"
+    (base / "versions" / "v000001").mkdir(parents=True)
+    (base / "CURRENT").write_text("v000001")
+    old = time.time() - 3600
+    os.utime(base / "versions", (old, old))
+    sm = _manager(tmp_path, ttl_seconds=600)
+
+    assert sm.sweep() == {"ttl": [], "quota": []}
+    assert (base / "versions" / "v000001").is_dir()
+
+
+def test_lock_files_of_gone_sessions_are_pruned(tmp_path):
+    _make_session(tmp_path, "old", 10, age=3600)
+    _make_session(tmp_path, "new", 10, age=120)
+    sm = _manager(tmp_path, ttl_seconds=600)
+    for sid in ("old", "new"):
+        with sm.ingesting(sid):
+            pass
+    sm.sweep()  # evicts "old", then prunes its locks
+    locks = tmp_path / "faiss_index" / sm.LOCK_DIR
+    assert sorted(p.name for p in locks.iterdir()) == ["new.ingest.lock"]
+    assert sm.metrics()["locks_removed"] >= 1
+
+
+def test_lock_waiter_retries_when_the_file_is_unlinked(tmp_path):
+    path = tmp_path / "s.lock"
+    entered = threading.Event()
+
+    def waiter():
+        with flocked(path, fcntl.LOCK_SH):
+            entered.set()
+
+    with flocked(path, fcntl.LOCK_EX):
+        t = threading.Thread(target=waiter)
+        t.start()
+        time.sleep(0.05)
+        path.unlink()  # as prune_locks() does while holding the lock
+    t.join(2)
+    assert entered.is_set()
+    assert path.exists()  # the waiter re-locked a fresh file instead of the unlinked one
@@ -0,0 +1,65 @@
+# tests/test_vector_compression.py
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from src.data_ingestion import FaissManager
+from src.retrieval import ConversationalRag
+from utils.fake_models import FakeEmbeddings, FakeModelLoader
+from utils.vector_compression import VectorFormat, ReducedEmbeddings
+
+TEXTS = [f"topic {i} word{i} shared{i % 7} extra{i % 3}" for i in range(60)]
+QUESTIONS = ["word3 shared3", "topic 41 extra2", "shared5 word12"]
+
+
+def _top(tmp_path, name, fmt):
+    loader = FakeModelLoader(embeddings=FakeEmbeddings(dim=64))
+    fm = FaissManager(tmp_path / name, loader, vector_format=fmt)
+    fm.load_or_create(texts=TEXTS, metadatas=[{"source": f"{i}.txt"} for i in range(len(TEXTS))])
+    rag = ConversationalRag(session_id=name, model_loader=loader)
+    rag.load_retriever_from_faiss(str(tmp_path / name), k=3)
+    return fm, rag, [[d.page_content for d in docs] for docs in rag.search_many(QUESTIONS, k=3)]
+
+
+def test_int8_with_rescore_matches_float32_results(tmp_path):
+    _, _, flat = _top(tmp_path, "flat", VectorFormat())
+    fm, rag, sq8 = _top(tmp_path, "sq8", VectorFormat(codec="int8", rescore=True, min_train=0))
+
+    assert isinstance(fm.vs.index, faiss.IndexScalarQuantizer)
+    assert sq8 == flat
+    assert [d.page_content for d in rag.retriever.invoke(QUESTIONS[0])] == flat[0]
+
+
+def test_int8_ranges_wait_for_a_training_set(tmp_path):
+    _, _, flat = _top(tmp_path, "flat", VectorFormat())
+    loader = FakeModelLoader(embeddings=FakeEmbeddings(dim=64))
+    fm = FaissManager(tmp_path / "sq8", loader, vector_format=VectorFormat(codec="int8", min_train=40))
+    fm.load_or_create(texts=TEXTS[:1], metadatas=[{"source": "0.txt"}])  # a one-chunk first upload
+    fm.add_docs([Document(page_content=t, metadata={"source": f"{i}.txt"}) for i, t in enumerate(TEXTS[1:30], 1)])
+    assert isinstance(fm.vs.index, faiss.IndexFlat)
+
+    fm.add_docs([Document(page_content=t, metadata={"source": f"{i}.txt"}) for i, t in enumerate(TEXTS[30:], 30)])
+    assert isinstance(fm.vs.index, faiss.IndexScalarQuantizer) and fm.vs.index.ntotal == len(TEXTS)
+    rag = ConversationalRag(session_id="sq8", model_loader=loader)
+    rag.load_retriever_from_faiss(str(tmp_path / "sq8"), k=3)
+    assert [[d.page_content for d in docs] for docs in rag.search_many(QUESTIONS, k=3)] == flat
+
+
+def test_format_is_recorded_and_survives_updates(tmp_path):
+    fm, _, _ = _top(tmp_path, "fp16", VectorFormat(codec="fp16", rescore=True))
+    fm.delete_source("0.txt")
+
+    reopened = FaissManager(tmp_path / "fp16", FakeModelLoader(embeddings=FakeEmbeddings(dim=64)))
+    reopened.load_or_create()
+    assert reopened.vector_format.codec == "fp16"
+    assert reopened.vs.index.ntotal == len(reopened.full_vectors.ids) == len(TEXTS) - 1
+
+
+def test_reduced_dimension_is_truncated_and_renormalized(tmp_path):
+    emb = ReducedEmbeddings(FakeEmbeddings(dim=64), dim=16, mode="request")
+    v = np.asarray(emb.embed_documents(["alpha beta gamma delta"]))
+    assert v.shape == (1, 16)
+    assert np.isclose(np.linalg.norm(v), 1.0)
+
+    fm, _, _ = _top(tmp_path, "dim16", VectorFormat(dim=16))
+    assert fm.vs.index.d == 16
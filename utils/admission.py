@@ -0,0 +1,163 @@
+from __future__ import annotations
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+from logger import global_logger as log
+from utils.metrics import percentile
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; the API turns it into 429 + Retry-After"""
+    def __init__(self, limiter: str, reason: str, retry_after: int):
+        super().__init__(f"{limiter} is saturated ({reason}), retry after {retry_after}s")
+        self.limiter = limiter
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded FIFO wait queue for one class of endpoints.
+
+    At most max_concurrent requests run at once; up to max_queue more wait in arrival order for
+    at most queue_timeout_seconds. Anything beyond that (or a session that already has
+    max_per_session requests running or waiting) is rejected right away with a Retry-After
+    estimated from the recent service time, instead of piling more index loads and provider
+    calls onto a saturated worker. Limits are per process, i.e. per uvicorn worker.
+    max_concurrent <= 0 disables the controller.
+
+    A request that fans out (a batch generating several answers at once) takes `weight` slots,
+    capped at max_concurrent, so the limit stays a bound on concurrent provider calls.
+    """
+    def __init__(self, name: str, max_concurrent: int, max_queue: int = 0,
+                 queue_timeout_seconds: float = 30.0, max_per_session: int = 0, window: int = 512):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.max_per_session = max_per_session
+        self._active = 0
+        self._waiters: Deque[Tuple[asyncio.Future, int]] = deque()  # (future, weight), FIFO
+        self._sessions: Dict[str, int] = {}
+        # metrics, read from the /metrics threadpool thread
+        self._lock = threading.Lock()
+        self._waits: Deque[float] = deque(maxlen=window)     # seconds spent queued, admitted requests
+        self._service: Deque[float] = deque(maxlen=window)   # seconds holding a slot
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0, "session_limit": 0}
+        self.max_queue_depth = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: queue ahead of the caller times mean service time"""
+        with self._lock:
+            mean = (sum(self._service) / len(self._service)) if self._service else 1.0
+        ahead = len(self._waiters) + 1
+        return max(1, min(60, math.ceil(mean * ahead / max(1, self.max_concurrent))))
+
+    def _reject(self, reason: str) -> None:
+        with self._lock:
+            self.rejected[reason] += 1
+        retry_after = self.retry_after()
+        log.warning("Request rejected by admission control", limiter=self.name, reason=reason,
+                    active=self._active, queued=len(self._waiters), retry_after=retry_after)
+        raise AdmissionRejected(self.name, reason, retry_after)
+
+    async def _acquire(self, weight: int) -> None:
+        if self._active + weight <= self.max_concurrent and not self._waiters:
+            self._active += weight
+            self._admitted(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((fut, weight))
+        with self._lock:
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(fut, self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            self._discard(fut)
+            self._reject("queue_timeout")
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release(weight)  # the slots were already handed to us; pass them on
+            else:
+                self._discard(fut)
+            raise
+        self._admitted(time.perf_counter() - t0)
+
+    def _discard(self, fut: asyncio.Future) -> None:
+        self._waiters = deque(w for w in self._waiters if w[0] is not fut)
+        self._wake()  # a heavy waiter leaving the head may unblock lighter ones behind it
+
+    def _admitted(self, waited: float) -> None:
+        with self._lock:
+            self.admitted += 1
+            self._waits.append(waited)
+
+    def _wake(self) -> None:
+        """Hand free slots to waiters in arrival order (the head waits until its weight fits)"""
+        while self._waiters:
+            fut, weight = self._waiters[0]
+            if fut.done():  # timed out or cancelled
+                self._waiters.popleft()
+                continue
+            if self._active + weight > self.max_concurrent:
+                return
+            self._waiters.popleft()
+            self._active += weight
+            fut.set_result(None)
+
+    def _release(self, weight: int) -> None:
+        self._active -= weight
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, session_id: Optional[str] = None, weight: int = 1) -> AsyncIterator[None]:
+        """Hold weight slots (one by default) for the duration of the block (raises AdmissionRejected)"""
+        if not self.enabled:
+            yield
+            return
+        weight = max(1, min(weight, self.max_concurrent))
+        if session_id and self.max_per_session > 0:
+            if self._sessions.get(session_id, 0) >= self.max_per_session:
+                self._reject("session_limit")
+            self._sessions[session_id] = self._sessions.get(session_id, 0) + 1
+        try:
+            await self._acquire(weight)
+            t0 = time.perf_counter()
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._service.append(time.perf_counter() - t0)
+                self._release(weight)
+        finally:
+            if session_id and self.max_per_session > 0:
+                left = self._sessions.get(session_id, 1) - 1
+                if left > 0:
+                    self._sessions[session_id] = left
+                else:
+                    self._sessions.pop(session_id, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            p50, p95, p99 = (percentile(self._waits, p) for p in (50, 95, 99))
+            service = percentile(self._service, 50)
+            return {
+                "max_concurrent": self.max_concurrent, "max_queue": self.max_queue,
+                "active": self._active, "queued": len(self._waiters), "max_queue_depth": self.max_queue_depth,
+                "admitted": self.admitted, "rejected": dict(self.rejected),
+                "wait_p50_ms": None if p50 is None else round(p50 * 1000, 1),
+                "wait_p95_ms": None if p95 is None else round(p95 * 1000, 1),
+                "wait_p99_ms": None if p99 is None else round(p99 * 1000, 1),
+                "service_p50_ms": None if service is None else round(service * 1000, 1),
+            }
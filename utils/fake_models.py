@@ -0,0 +1,117 @@
+from __future__ import annotations
+import re
+import time
+import random
+import asyncio
+import hashlib
+import math
+from typing import Any, Callable, List, Optional, Tuple, Union
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
+
+
+class FakeProviderError(RuntimeError):
+    """Error injected by FakeChatModel"""
+
+
+Latency = Union[float, Tuple[float, float], Callable[[], float]]
+
+
+class FakeChatModel(Runnable):
+    """Local stand-in for a chat model provider, with injectable latency and errors.
+
+    latency is seconds: a constant, a (low, high) uniform range or a callable.
+    error_rate is the probability that a call raises FakeProviderError.
+    """
+    def __init__(self, name: str = "fake", latency: Latency = 0.0, error_rate: float = 0.0,
+                 reply: Optional[Callable[[str], str]] = None, seed: Optional[int] = None):
+        self.name = name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.reply = reply
+        self.calls = 0
+        self.cancelled = 0
+        self._rng = random.Random(seed)
+
+    def _next_latency(self) -> float:
+        if callable(self.latency):
+            return float(self.latency())
+        if isinstance(self.latency, tuple):
+            return self._rng.uniform(*self.latency)
+        return float(self.latency)
+
+    @staticmethod
+    def _prompt_text(input: Any) -> str:
+        if hasattr(input, "to_messages"):
+            msgs = input.to_messages()
+            return str(msgs[-1].content) if msgs else ""
+        if isinstance(input, list) and input:
+            return str(getattr(input[-1], "content", input[-1]))
+        return str(input)
+
+    def _respond(self, input: Any) -> AIMessage:
+        if self._rng.random() < self.error_rate:
+            raise FakeProviderError(f"{self.name}: injected failure")
+        text = self._prompt_text(input)
+        return AIMessage(content=self.reply(text) if self.reply else f"[{self.name}] {text[:200]}")
+
+    def invoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        time.sleep(self._next_latency())
+        return self._respond(input)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self._next_latency())
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self._respond(input)
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hashed bag-of-words (+ character trigram) embeddings: texts sharing words
+    are close, no network.
+
+    embedded counts every text sent for embedding and calls counts embedding requests.
+    """
+    def __init__(self, dim: int = 64, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+        self.embedded = 0
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        v = [0.0] * self.dim
+        words = re.findall(r"\w+", text.lower())
+        grams = [w[i:i + 3] for w in words for i in range(max(1, len(w) - 2))]
+        for tok, weight in [(w, 1.0) for w in words] + [("#" + g, 0.5) for g in grams]:
+            h = int.from_bytes(hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest(), "little")
+            v[h % self.dim] += weight if (h >> 32) & 1 else -weight
+        norm = math.sqrt(sum(x * x for x in v)) or 1.0
+        return [x / norm for x in v]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.embedded += len(texts)
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeModelLoader:
+    """Drop-in for ModelLoader (load_embeddings / load_llm) backed by the fakes above"""
+    def __init__(self, embeddings: Optional[FakeEmbeddings] = None, llm: Optional[Runnable] = None):
+        self.embeddings = embeddings or FakeEmbeddings()
+        self.llm = llm or FakeChatModel()
+
+    def load_embeddings(self):
+        return self.embeddings
+
+    def load_llm(self):
+        return self.llm
@@ -0,0 +1,100 @@
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Tuple
+from logger import global_logger as log
+from utils.vector_compression import VectorFormat, FullVectorStore, read_vector_format, wrap_embeddings
+from utils.index_store import IndexSnapshotStore
+from utils.metadata_filter import FacetIndex
+
+
+@dataclass
+class LoadedIndex:
+    """A session index as served to queries"""
+    vectorstore: Any                              # langchain FAISS
+    embeddings: Any                               # query embeddings matching the index's vector format
+    vector_format: VectorFormat
+    full_vectors: Optional[FullVectorStore] = None  # memory-mapped, only when vector_format.rescore
+    version: Optional[str] = None                   # snapshot version (None for legacy unversioned indexes)
+    facets: Optional[FacetIndex] = None             # source/page/file_type -> FAISS positions, for filters
+
+
+class IndexCache:
+    """Small in-process LRU of loaded FAISS indexes.
+
+    Entries are keyed by index directory and index name and tagged with the snapshot version
+    (see utils/index_store.py), so a re-indexed session is picked up on the next lookup instead
+    of serving a stale store. Version names are unique across rebuilds of a directory, so a
+    session evicted by another worker and re-created is not mistaken for the cached one. Legacy unversioned indexes are tagged with their files' mtimes.
+    """
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max(0, int(max_entries))
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, LoadedIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(index_dir: Path, index_name: str) -> Optional[Tuple]:
+        try:
+            return tuple(
+                (st.st_mtime_ns, st.st_size)
+                for st in (os.stat(index_dir / f"{index_name}.faiss"), os.stat(index_dir / f"{index_name}.pkl"))
+            )
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def load(index_dir: Path, embeddings, index_name: str = "index", version: Optional[str] = None) -> LoadedIndex:
+        """Load one snapshot directory"""
+        from langchain_community.vectorstores import FAISS
+
+        fmt = read_vector_format(index_dir)
+        query_embeddings = wrap_embeddings(embeddings, fmt)
+        vs = FAISS.load_local(
+            str(index_dir),
+            embeddings=query_embeddings,
+            index_name=index_name,
+            allow_dangerous_deserialization=True,  # ok if you trust the index
+        )
+        full = FullVectorStore.load(index_dir, mmap=True) if fmt.rescore else None
+        facets = FacetIndex.load(index_dir) or FacetIndex.from_vectorstore(vs)
+        return LoadedIndex(vs, query_embeddings, fmt, full, version, facets)
+
+    def get(self, index_path: str, embeddings, index_name: str = "index") -> LoadedIndex:
+        """Return the loaded index for index_path, reading it from disk on a miss."""
+        store = IndexSnapshotStore(Path(index_path))
+        version = store.current_version()
+        index_dir = store.current_path()
+        key = (str(store.index_dir.resolve()), index_name)
+        stamp = version or self._stamp(index_dir, index_name)
+
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and hit[0] == stamp:
+                self._entries.move_to_end(key)
+                return hit[1]
+
+        loaded = self.load(index_dir, embeddings, index_name, version)
+        if self.max_entries and stamp is not None:
+            with self._lock:
+                self._entries[key] = (stamp, loaded)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        log.info("FAISS index loaded into cache", index_path=str(index_dir), version=version, cached=len(self._entries))
+        return loaded
+
+    def invalidate(self, index_path: str) -> None:
+        prefix = str(Path(index_path).resolve())
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == prefix]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+index_cache = IndexCache(int(os.getenv("INDEX_CACHE_SIZE", "16")))
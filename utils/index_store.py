@@ -0,0 +1,156 @@
+from __future__ import annotations
+import os
+import time
+import uuid
+import fcntl
+import shutil
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+from logger import global_logger as log
+
+
+class IndexBusyError(RuntimeError):
+    """Raised by a non-blocking write_lock() when another writer holds the index"""
+
+
+@contextmanager
+def flocked(path: Path, operation: int) -> Iterator[None]:
+    """flock() path (created if missing) for the duration of the block.
+
+    Lock files may be unlinked by whoever holds them exclusively (see
+    SessionStorageManager.prune_locks), so after locking, the open file is checked to still be
+    the one at path; if it was unlinked or replaced meanwhile, the lock is retried on the new
+    file. Raises BlockingIOError when operation has LOCK_NB and the lock is held.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        with open(path, "a+") as fh:
+            fcntl.flock(fh.fileno(), operation)
+            try:
+                same = os.fstat(fh.fileno()).st_ino == os.stat(path).st_ino
+            except FileNotFoundError:
+                same = False
+            if not same:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+                continue
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            return
+
+
+class IndexSnapshotStore:
+    """Versioned, atomically published snapshots of one index directory.
+
+        faiss_index/
+            .locks/<session>.write.lock   flock()-ed by writers (serializes uvicorn workers and threads)
+            <session>/
+                CURRENT                   name of the live version, replaced atomically
+                versions/
+                    v000007-3f9c2a1b/     index.faiss, index.pkl, ingested_meta.json (+ vectors.* when rescoring)
+
+    Writers build a complete snapshot in a temp directory, rename it to the next version and then
+    swap CURRENT. Readers only read CURRENT and an immutable version directory, so they never
+    block and never see a half-written index. Version names carry a random suffix after the
+    counter, so a session directory that is deleted and rebuilt never reuses a name a reader
+    (or another worker's IndexCache) has already seen. Old versions are removed once they are both
+    outside the last keep_versions and were superseded more than gc_grace_seconds ago, which
+    leaves in-flight readers time to finish: the time a version stops being live is stamped as
+    the mtime of a .superseded marker in it (build time says nothing about when readers stopped
+    opening it). An index written before versioning (files directly in the session directory)
+    is read as is until its first write.
+
+    The lock file lives beside the index directory rather than in it, so deleting the whole
+    directory (session eviction) never unlinks a lock that is held.
+    """
+    CURRENT_FILE = "CURRENT"
+    LOCK_DIR = ".locks"
+    VERSIONS_DIR = "versions"
+    SUPERSEDED_MARKER = ".superseded"
+
+    def __init__(self, index_dir: Path, keep_versions: int = 3, gc_grace_seconds: float = 60):
+        self.index_dir = Path(index_dir)
+        self.versions_dir = self.index_dir / self.VERSIONS_DIR
+        self.lock_path = self.index_dir.parent / self.LOCK_DIR / f"{self.index_dir.name}.write.lock"
+        self.keep_versions = max(1, keep_versions)
+        self.gc_grace_seconds = gc_grace_seconds
+
+    # ------------------------------ readers ------------------------------ #
+    def current_version(self) -> Optional[str]:
+        try:
+            version = (self.index_dir / self.CURRENT_FILE).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+        return version if version and (self.versions_dir / version).is_dir() else None
+
+    def current_path(self) -> Path:
+        """Directory holding the live snapshot (the index directory itself for legacy indexes)"""
+        version = self.current_version()
+        return self.versions_dir / version if version else self.index_dir
+
+    # ------------------------------ writers ------------------------------ #
+    @contextmanager
+    def write_lock(self, blocking: bool = True) -> Iterator[None]:
+        with ExitStack() as stack:
+            try:
+                stack.enter_context(flocked(self.lock_path, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB)))
+            except BlockingIOError as e:
+                raise IndexBusyError(f"Index {self.index_dir} is being written") from e
+            yield
+
+    def new_snapshot_dir(self) -> Path:
+        d = self.versions_dir / f".tmp-{uuid.uuid4().hex}"
+        d.mkdir(parents=True)
+        return d
+
+    def _versions(self) -> List[str]:
+        try:
+            return sorted(p.name for p in self.versions_dir.iterdir() if p.is_dir() and p.name.startswith("v"))
+        except FileNotFoundError:
+            return []
+
+    def commit(self, snapshot_dir: Path) -> str:
+        """Publish a fully written snapshot as the next version (caller holds write_lock)"""
+        previous = self.current_version()
+        versions = self._versions()
+        number = int(versions[-1][1:].split("-")[0]) + 1 if versions else 1
+        version = f"v{number:06d}-{uuid.uuid4().hex[:8]}"
+        os.rename(snapshot_dir, self.versions_dir / version)
+
+        tmp = self.index_dir / f".{self.CURRENT_FILE}.{uuid.uuid4().hex}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.index_dir / self.CURRENT_FILE)
+        if previous:
+            (self.versions_dir / previous / self.SUPERSEDED_MARKER).touch()
+        log.info("Index snapshot committed", index=str(self.index_dir), version=version)
+        self._gc(version)
+        return version
+
+    def _superseded_at(self, marker: Path, now: float) -> float:
+        """When the snapshot owning marker stopped being live; unmarked ones (superseded before
+        markers existed, or by the commit that just ran) are stamped now"""
+        try:
+            return marker.stat().st_mtime
+        except FileNotFoundError:
+            marker.touch()
+            return now
+
+    def _gc(self, live: str) -> None:
+        now = time.time()
+        for name in self._versions()[:-self.keep_versions]:
+            d = self.versions_dir / name
+            if name != live and now - self._superseded_at(d / self.SUPERSEDED_MARKER, now) > self.gc_grace_seconds:
+                shutil.rmtree(d, ignore_errors=True)
+        for p in self.versions_dir.glob(".tmp-*"):  # snapshots of writers that died mid-build
+            if now - p.stat().st_mtime > self.gc_grace_seconds:
+                shutil.rmtree(p, ignore_errors=True)
+        legacy = [p for p in self.index_dir.iterdir()  # unversioned files, superseded by the first CURRENT
+                  if p.is_file() and p.name != self.CURRENT_FILE and not p.name.startswith(".")]
+        if legacy and now - self._superseded_at(self.index_dir / self.SUPERSEDED_MARKER, now) > self.gc_grace_seconds:
+            for p in legacy:
+                p.unlink(missing_ok=True)
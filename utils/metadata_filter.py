@@ -0,0 +1,154 @@
+from __future__ import annotations
+import os
+import re
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+import numpy as np
+
+# Chunk metadata fields a query can be restricted to. "source" is the stored upload path
+# (data/<session>/handbook_2025_1213ea.pdf); "filename" is the name it was uploaded under
+# (handbook_2025.pdf), derived from source, so callers do not have to look paths up first.
+FILTER_FIELDS = ("source", "filename", "page", "file_type")
+
+_UPLOAD_SUFFIX = re.compile(r"_[0-9a-f]{6}$")  # save_uploaded_files stores <safe stem>_<6 hex><ext>
+
+FilterValue = Union[str, int, Sequence[Union[str, int]]]
+
+
+def facet_values(md: Mapping[str, Any]) -> Dict[str, str]:
+    """Filterable field -> value of one chunk, as strings ("page" is the loader's page number)"""
+    out: Dict[str, str] = {}
+    src = md.get("source") or md.get("file_path")
+    if src is not None:
+        out["source"] = str(src)
+    if md.get("page") is not None:
+        out["page"] = str(md["page"])
+    file_type = md.get("file_type") or (Path(str(src)).suffix.lstrip(".") if src is not None else "")
+    if file_type:
+        out["file_type"] = str(file_type).lower().lstrip(".")
+    return out
+
+
+def upload_filename(name: str) -> str:
+    """A file name as save_uploaded_files normalizes it ("Handbook 2025.PDF" -> "handbook_2025.pdf")"""
+    p = Path(name)
+    return re.sub(r"[^a-zA-Z0-9_\-]", "_", p.stem).lower() + p.suffix.lower()
+
+
+def source_filename(source: str) -> str:
+    """Uploaded file name of a stored source path (the random upload suffix dropped)"""
+    p = Path(source)
+    return upload_filename(_UPLOAD_SUFFIX.sub("", p.stem) + p.suffix)
+
+
+def normalize_filters(filters: Optional[Mapping[str, FilterValue]]) -> Optional[Dict[str, List[str]]]:
+    """{field: value or [values]} -> {field: [str values]}; None/empty means no filter.
+
+    Values of one field are OR-ed, fields are AND-ed. Raises ValueError on unknown fields.
+    """
+    if not filters:
+        return None
+    out: Dict[str, List[str]] = {}
+    for field, value in filters.items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unsupported filter field: {field} (expected one of {list(FILTER_FIELDS)})")
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        if field == "file_type":
+            out[field] = [str(v).lower().lstrip(".") for v in values]
+        elif field == "filename":
+            out[field] = [upload_filename(str(v)) for v in values]
+        else:
+            out[field] = [str(v) for v in values]
+    return out
+
+
+def _to_ranges(positions: Iterable[int]) -> List[List[int]]:
+    """Sorted positions -> [[start, stop), ...]; chunks of one file are mostly contiguous"""
+    ranges: List[List[int]] = []
+    for p in sorted(positions):
+        if ranges and ranges[-1][1] == p:
+            ranges[-1][1] = p + 1
+        else:
+            ranges.append([p, p + 1])
+    return ranges
+
+
+class FacetIndex:
+    """FAISS positions of the chunks carrying each (field, value), for filtered search.
+
+    Stored beside a snapshot as run-length ranges (facets.json). Positions are only valid for
+    the snapshot they were written with, which is fine because snapshots are immutable.
+    select() turns a filter into the sorted position array fed to a FAISS IDSelector, so the
+    search only scores the selected chunks. The "filename" sets are derived from the "source"
+    sets on load rather than stored, so indexes written before that field existed filter too.
+    """
+    FILE = "facets.json"
+    DERIVED = ("filename",)
+
+    def __init__(self, sets: Dict[str, Dict[str, np.ndarray]]):
+        self.sets = dict(sets)
+        if "source" in self.sets and "filename" not in self.sets:
+            by_name: Dict[str, List[np.ndarray]] = {}
+            for src, positions in self.sets["source"].items():
+                by_name.setdefault(source_filename(src), []).append(positions)
+            self.sets["filename"] = {name: np.unique(np.concatenate(parts)) for name, parts in by_name.items()}
+
+    @classmethod
+    def from_ids(cls, id_sets: Mapping[str, Mapping[str, Iterable[str]]],
+                 index_to_docstore_id: Mapping[int, str]) -> "FacetIndex":
+        """Build from docstore-id sets (the manifest) and the store's position -> id mapping"""
+        pos = {doc_id: i for i, doc_id in index_to_docstore_id.items()}
+        return cls({
+            field: {value: np.array(sorted(pos[d] for d in ids if d in pos), dtype=np.int64)
+                    for value, ids in values.items()}
+            for field, values in id_sets.items()
+        })
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore) -> "FacetIndex":
+        """Build from docstore metadata (indexes written before facets were recorded)"""
+        sets: Dict[str, Dict[str, List[int]]] = {}
+        for i, doc_id in vectorstore.index_to_docstore_id.items():
+            doc = vectorstore.docstore.search(doc_id)
+            for field, value in facet_values(getattr(doc, "metadata", None) or {}).items():
+                sets.setdefault(field, {}).setdefault(value, []).append(i)
+        return cls({f: {v: np.array(sorted(p), dtype=np.int64) for v, p in values.items()}
+                    for f, values in sets.items()})
+
+    @classmethod
+    def load(cls, index_dir: Path) -> Optional["FacetIndex"]:
+        try:
+            raw = json.loads((Path(index_dir) / cls.FILE).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        return cls({
+            field: {value: (np.concatenate([np.arange(a, b, dtype=np.int64) for a, b in ranges])
+                            if ranges else np.zeros(0, dtype=np.int64))
+                    for value, ranges in values.items()}
+            for field, values in raw.items()
+        })
+
+    def save(self, index_dir: Path) -> None:
+        tmp = Path(index_dir) / f".{self.FILE}.tmp"
+        tmp.write_text(json.dumps({f: {v: _to_ranges(p.tolist()) for v, p in values.items()}
+                                   for f, values in self.sets.items() if f not in self.DERIVED},
+                                  ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, Path(index_dir) / self.FILE)
+
+    def values(self, field: str) -> Dict[str, int]:
+        return {v: len(p) for v, p in self.sets.get(field, {}).items()}
+
+    def select(self, filters: Optional[Mapping[str, List[str]]]) -> Optional[np.ndarray]:
+        """Sorted positions matching normalized filters (None when there is nothing to filter)"""
+        if not filters:
+            return None
+        selected: Optional[np.ndarray] = None
+        for field, values in filters.items():
+            sets = self.sets.get(field, {})
+            parts = [sets[v] for v in values if v in sets]
+            match = np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+            selected = match if selected is None else np.intersect1d(selected, match, assume_unique=True)
+            if not len(selected):
+                break
+        return selected
@@ -0,0 +1,10 @@
+from __future__ import annotations
+from typing import Iterable, Optional
+
+
+def percentile(values: Iterable[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of values (None when there are none)"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
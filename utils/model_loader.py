@@ -1,13 +1,20 @@
 import os
 import sys
 import json
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from langchain_core.runnables import Runnable
 from utils.config_loader import load_config
+from utils.metrics import percentile
 from logger import global_logger as log
 from exceptions.custom_exception import DocumentPortalException
 from dotenv import load_dotenv
 import json
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain_groq import ChatGroq
+# Provider SDKs (langchain_google_genai, langchain_groq) are imported inside the load_* methods:
+# they dominate import time of api.main and are only needed once a client is actually built.
 
 class ApiManager:
     REQUIRED_KEYS= ["GOOGLE_API_KEY", "GROQ_API_KEY"]
@@ -47,6 +54,173 @@ class ApiManager:
             raise KeyError(f"API key for {key} is missing")
         return val
 
+class ProviderStats:
+    """Rolling latency / error window for one LLM provider"""
+    def __init__(self, window:int = 100):
+        self.latencies: Deque[float]= deque(maxlen=window)  # seconds, successful calls only
+        self.outcomes: Deque[bool]= deque(maxlen=window)    # True = success
+        self.calls= 0
+        self.errors= 0
+        self.hedges= 0          # times this provider was the primary and a hedge was fired
+        self.hedge_wins= 0      # times this provider answered as the hedge and won
+        self.last_error_at: Optional[float]= None
+        self._lock= threading.Lock()
+
+    def record(self, latency:float, ok:bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(latency)
+            else:
+                self.errors += 1
+                self.last_error_at= time.monotonic()
+
+    def error_rate(self) -> float:
+        with self._lock:
+            return (self.outcomes.count(False) / len(self.outcomes)) if self.outcomes else 0.0
+
+    def percentile(self, pct:float) -> Optional[float]:
+        with self._lock:
+            latencies= list(self.latencies)
+        return percentile(latencies, pct)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95, p99= (self.percentile(p) for p in (50, 95, 99))
+        return {
+            "calls": self.calls, "errors": self.errors, "error_rate": round(self.error_rate(), 4),
+            "p50_ms": None if p50 is None else round(p50 * 1000, 1),
+            "p95_ms": None if p95 is None else round(p95 * 1000, 1),
+            "p99_ms": None if p99 is None else round(p99 * 1000, 1),
+            "hedges": self.hedges, "hedge_wins": self.hedge_wins,
+        }
+
+
+class ProviderRouter(Runnable):
+    """Routes LLM calls across providers (e.g. google, groq) by health.
+
+    - Failover: on an error the next provider is tried; a provider whose recent error rate
+      reaches error_threshold is moved to the back of the line for cooldown_seconds.
+    - Hedging (optional, ainvoke only): once the primary has min_samples successes, a second
+      request is sent to the next provider when the primary exceeds its hedge_percentile
+      latency; the first answer wins and the loser is cancelled. invoke is failover only and
+      never sends a speculative request, since a blocking call cannot abandon a slow primary.
+
+    It is a Runnable, so it drops into LCEL chains in place of a chat model.
+    """
+    def __init__(self, providers:Dict[str, Runnable], *, window:int = 100, error_threshold:float = 0.5,
+                 min_error_samples:int = 5, cooldown_seconds:float = 30.0, hedge_enabled:bool = False,
+                 hedge_percentile:float = 95.0, hedge_min_samples:int = 20):
+        if not providers:
+            raise ValueError("ProviderRouter needs at least one provider")
+        self.providers= dict(providers)
+        self.stats= {name: ProviderStats(window) for name in self.providers}
+        self.error_threshold= error_threshold
+        self.min_error_samples= min_error_samples
+        self.cooldown_seconds= cooldown_seconds
+        self.hedge_enabled= hedge_enabled
+        self.hedge_percentile= hedge_percentile
+        self.hedge_min_samples= hedge_min_samples
+
+    # ------------------------- routing decisions ------------------------- #
+    def _unhealthy(self, name:str) -> bool:
+        st= self.stats[name]
+        if len(st.outcomes) < self.min_error_samples or st.last_error_at is None:
+            return False
+        if time.monotonic() - st.last_error_at > self.cooldown_seconds:
+            return False  # cooldown over: let it take traffic again as a probe
+        return st.error_rate() >= self.error_threshold
+
+    def order(self) -> List[str]:
+        """Provider names in the order they will be tried (configured order, unhealthy last)"""
+        names= list(self.providers)
+        return sorted(names, key=lambda n: (self._unhealthy(n), names.index(n)))
+
+    def _hedge_delay(self, name:str) -> Optional[float]:
+        if not self.hedge_enabled or len(self.providers) < 2:
+            return None
+        st= self.stats[name]
+        if len(st.latencies) < self.hedge_min_samples:
+            return None
+        return st.percentile(self.hedge_percentile)
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        return {"order": self.order(), "providers": {n: st.snapshot() for n, st in self.stats.items()}}
+
+    # ------------------------------ calls ------------------------------ #
+    def _call(self, name:str, input, config, **kwargs):
+        t0= time.perf_counter()
+        try:
+            out= self.providers[name].invoke(input, config, **kwargs)
+        except Exception:
+            self.stats[name].record(time.perf_counter() - t0, ok=False)
+            raise
+        self.stats[name].record(time.perf_counter() - t0, ok=True)
+        return out
+
+    async def _acall(self, name:str, input, config, **kwargs):
+        t0= time.perf_counter()
+        try:
+            out= await self.providers[name].ainvoke(input, config, **kwargs)
+        except asyncio.CancelledError:
+            raise  # lost a hedge race: not an error, and the latency is unknown
+        except Exception:
+            self.stats[name].record(time.perf_counter() - t0, ok=False)
+            raise
+        self.stats[name].record(time.perf_counter() - t0, ok=True)
+        return out
+
+    def _all_failed(self, errors:Dict[str, str]):
+        log.error("All LLM providers failed", errors=errors)
+        return DocumentPortalException(f"All LLM providers failed: {errors}", sys)
+
+    def invoke(self, input, config=None, **kwargs):
+        errors: Dict[str, str]= {}
+        for name in self.order():
+            try:
+                return self._call(name, input, config, **kwargs)
+            except Exception as e:
+                log.warning("LLM provider failed, failing over", provider=name, error=str(e))
+                errors[name]= str(e)
+        raise self._all_failed(errors)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        order= self.order()
+        errors: Dict[str, str]= {}
+        start= 0
+        delay= self._hedge_delay(order[0])
+        if delay is not None:
+            primary, hedge= order[0], order[1]
+            tasks= {asyncio.ensure_future(self._acall(primary, input, config, **kwargs)): primary}
+            done, _= await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.stats[primary].hedges += 1
+                log.info("LLM hedge fired", primary=primary, hedge=hedge, after_ms=round(delay * 1000, 1))
+                tasks[asyncio.ensure_future(self._acall(hedge, input, config, **kwargs))]= hedge
+            pending= set(tasks)
+            try:
+                while pending:
+                    done, pending= await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for t in done:
+                        if t.exception() is not None:
+                            errors[tasks[t]]= str(t.exception())
+                            continue
+                        if tasks[t] != primary:
+                            self.stats[tasks[t]].hedge_wins += 1
+                        return t.result()
+            finally:
+                for loser in pending:
+                    loser.cancel()
+            start= len(tasks)
+        for name in order[start:]:
+            try:
+                return await self._acall(name, input, config, **kwargs)
+            except Exception as e:
+                log.warning("LLM provider failed, failing over", provider=name, error=str(e))
+                errors[name]= str(e)
+        raise self._all_failed(errors)
+
+
 class ModelLoader:
     def __init__(self):
         if os.getenv("ENV", "local").lower() != "production":
@@ -56,35 +230,109 @@ class ModelLoader:
             log.info ("Running in Production Mode")
         self.api_key_mgr= ApiManager()
         self.config = load_config()
-        log.info ("Yaml config file is Loaded", config_keys=list[self.config.keys()])
+        log.info ("Yaml config file is Loaded", config_keys=list(self.config.keys()))
+        # Clients are built once per loader and reused; see get_model_loader() for the shared instance
+        self._embeddings = None
+        self._llm = None
+        self._lock = threading.Lock()
+
     def load_embeddings (self):
-        """Load Embedinng Model"""
+        """Load Embedinng Model (cached on the loader after the first call)"""
+        if self._embeddings is not None:
+            return self._embeddings
         try:
-            model_name= self.config["embedding_model"]["model"]
-            log.info("Embedding Model is Loading")
-            return GoogleGenerativeAIEmbeddings(model=model_name, google_api_key=self.api_key_mgr.got_keys("GOOGLE_API_KEY"))
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            with self._lock:
+                if self._embeddings is None:
+                    model_name= self.config["embedding_model"]["model"]
+                    log.info("Embedding Model is Loading")
+                    self._embeddings = GoogleGenerativeAIEmbeddings(model=model_name, google_api_key=self.api_key_mgr.got_keys("GOOGLE_API_KEY"))
+            return self._embeddings
         except Exception as e:
             log.error("Error Loading Embedding Model", error=str(e))
             raise DocumentPortalException ("Failed to Load Embeding Model", sys)
+    def _build_provider_llm(self, provider:str):
+        """Build the chat model for one provider block under `llm` in configuration.yaml"""
+        cfg= self.config["llm"][provider]
+        if provider == "google":
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            return ChatGoogleGenerativeAI(model=cfg["llm_name"],
+                                          api_key=self.api_key_mgr.got_keys("GOOGLE_API_KEY"),
+                                          temperature=0.2,
+                                          max_output_tokens=1024)
+        if provider == "groq":
+            from langchain_groq import ChatGroq
+            return ChatGroq(model=cfg["llm_name"],
+                            api_key=self.api_key_mgr.got_keys("GROQ_API_KEY"),
+                            temperature=cfg.get("temperature", 0),
+                            max_tokens=cfg.get("max_output_tokens", 1024))
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+
     def load_llm(self):
-        """Loading of LLM initiates"""
-        api_key= self.api_key_mgr.got_keys("GOOGLE_API_KEY")
-        if not api_key:
-            raise DocumentPortalException("API key is missing")
+        """Loading of LLM initiates (cached on the loader after the first call).
 
+        With more than one provider under `llm_router.providers` a ProviderRouter is returned,
+        otherwise the plain Google chat model.
+        """
+        if self._llm is not None:
+            return self._llm
         try:
-            llm_model=self.config["llm"]["google"]["llm_name"]
-            log.info("LLM is Loading")
-            return ChatGoogleGenerativeAI(model=llm_model,
-                                          api_key=api_key,
-                                          temperature=0.2,
-                                          max_output_tokens=1024)
+            with self._lock:
+                if self._llm is None:
+                    router_cfg= self.config.get("llm_router") or {}
+                    providers= router_cfg.get("providers") or ["google"]
+                    log.info("LLM is Loading", providers=providers)
+                    if len(providers) == 1:
+                        self._llm = self._build_provider_llm(providers[0])
+                    else:
+                        hedge_cfg= router_cfg.get("hedge") or {}
+                        self._llm = ProviderRouter(
+                            {name: self._build_provider_llm(name) for name in providers},
+                            window=router_cfg.get("window", 100),
+                            error_threshold=router_cfg.get("error_threshold", 0.5),
+                            min_error_samples=router_cfg.get("min_error_samples", 5),
+                            cooldown_seconds=router_cfg.get("cooldown_seconds", 30),
+                            hedge_enabled=hedge_cfg.get("enabled", False),
+                            hedge_percentile=hedge_cfg.get("percentile", 95),
+                            hedge_min_samples=hedge_cfg.get("min_samples", 20),
+                        )
+            return self._llm
         
         except Exception as e:
-            log.error("Error Loading Embedding Model", error=str(e))
-            raise DocumentPortalException ("Failed to Load Embeding Model", sys)
+            log.error("Error Loading LLM", error=str(e))
+            raise DocumentPortalException ("Failed to Load LLM", sys)
         
 
+
+_shared_loader: Optional[ModelLoader] = None
+_shared_lock = threading.Lock()
+
+def router_stats() -> Optional[Dict[str, Any]]:
+    """Per-provider routing stats of the shared loader's LLM (None until a ProviderRouter is built)"""
+    llm= getattr(_shared_loader, "_llm", None)
+    return llm.stats_snapshot() if isinstance(llm, ProviderRouter) else None
+
+def _fake_model_loader():
+    """Local fakes instead of provider clients (MODEL_BACKEND=fake): replays, load tests, CI"""
+    from utils.fake_models import FakeChatModel, FakeEmbeddings, FakeModelLoader
+    log.info("Using fake model backend")
+    return FakeModelLoader(
+        embeddings=FakeEmbeddings(latency=float(os.getenv("FAKE_EMBED_LATENCY", "0"))),
+        llm=FakeChatModel(latency=float(os.getenv("FAKE_LLM_LATENCY", "0"))),
+    )
+
+def get_model_loader() -> ModelLoader:
+    """Process-wide ModelLoader, so .env/YAML are read once per worker and clients are shared across requests."""
+    global _shared_loader
+    if _shared_loader is None:
+        with _shared_lock:
+            if _shared_loader is None:
+                if os.getenv("MODEL_BACKEND", "provider").lower() == "fake":
+                    _shared_loader = _fake_model_loader()
+                else:
+                    _shared_loader = ModelLoader()
+    return _shared_loader
+
         #python -m utils.model_loader
 if __name__=="__main__":
     loader= ModelLoader()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+import os
+import gzip
+import json
+import uuid
+import hashlib
+import threading
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from logger import global_logger as log
+
+# Loader (and the package that does the actual parsing) per extension; part of the cache key,
+# so upgrading a parser invalidates what it extracted before
+PARSERS = {
+    ".pdf": ("PyPDFLoader", "pypdf"),
+    ".docx": ("Docx2txtLoader", "docx2txt"),
+    ".txt": ("TextLoader", None),
+}
+_SOURCE = "\x00source\x00"  # placeholder for the uploaded file's path inside cached metadata
+
+
+def _version(package: Optional[str]) -> str:
+    if package is None:
+        return "-"
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return "?"
+
+
+def parser_version(ext: str) -> str:
+    loader, package = PARSERS[ext]
+    return f"{loader}/{package or 'builtin'}-{_version(package)}/langchain-community-{_version('langchain-community')}"
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ParsedTextCache:
+    """Content-addressed cache of extracted page text + metadata on local disk.
+
+    Entries are gzip-compressed JSON keyed by sha256(file bytes) and the parser version, so the
+    same file uploaded again (by anyone, to any session) skips parsing. Metadata that pointed at
+    the original upload path is re-pointed at the new one. When the cache grows past max_bytes
+    the least recently used entries (file mtime, refreshed on every hit) are deleted.
+
+    The shared cache (get_parse_cache()) lives in <UPLOAD_BASE>/.parse_cache. It is bounded by
+    its own max_bytes (PARSE_CACHE_MAX_BYTES) and is not a session, so it is neither counted
+    against STORAGE_QUOTA_BYTES nor evicted by the session sweep.
+    """
+    def __init__(self, cache_dir: str = "data/.parse_cache", max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes: Optional[int] = None  # running estimate, rescanned when it crosses max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, sha: str, ext: str) -> Path:
+        key = hashlib.sha256(f"{sha}:{parser_version(ext)}".encode("utf-8")).hexdigest()
+        return self.cache_dir / key[:2] / f"{key}.json.gz"
+
+    def get(self, path: Path, sha: Optional[str] = None) -> Optional[List[Document]]:
+        ext = path.suffix.lower()
+        if ext not in PARSERS:
+            return None
+        entry = self._entry(sha or file_sha256(path), ext)
+        try:
+            with gzip.open(entry, "rt", encoding="utf-8") as f:
+                rows = json.load(f)
+            os.utime(entry, None)  # LRU
+        except (FileNotFoundError, OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        source = str(path)
+        return [
+            Document(page_content=r["page_content"],
+                     metadata={k: (source if v == _SOURCE else v) for k, v in r["metadata"].items()})
+            for r in rows
+        ]
+
+    def put(self, path: Path, docs: List[Document], sha: Optional[str] = None) -> None:
+        ext = path.suffix.lower()
+        if ext not in PARSERS:
+            return
+        entry = self._entry(sha or file_sha256(path), ext)
+        source = str(path)
+        rows: List[Dict[str, Any]] = [
+            {"page_content": d.page_content,
+             "metadata": {k: (_SOURCE if v == source else v) for k, v in (d.metadata or {}).items()}}
+            for d in docs
+        ]
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_name(f".{entry.name}.{uuid.uuid4().hex}")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False)
+        try:
+            replaced = entry.stat().st_size  # same file uploaded again after a miss (e.g. a race)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp, entry)  # concurrent writers of the same entry write identical content
+        size = entry.stat().st_size
+        with self._lock:
+            self._bytes = (self._scan_bytes() if self._bytes is None else self._bytes + size - replaced)
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _files(self) -> List[Tuple[Path, os.stat_result]]:
+        out = []
+        for p in self.cache_dir.glob("*/*.json.gz"):
+            try:
+                out.append((p, p.stat()))
+            except FileNotFoundError:
+                continue
+        return out
+
+    def _scan_bytes(self) -> int:
+        return sum(st.st_size for _, st in self._files())
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits max_bytes; returns entries removed"""
+        files = sorted(self._files(), key=lambda f: f[1].st_mtime)
+        total = sum(st.st_size for _, st in files)
+        removed = 0
+        for p, st in files:
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= st.st_size
+            removed += 1
+        with self._lock:
+            self._bytes = total
+        if removed:
+            log.info("Parse cache evicted", entries=removed, bytes=total)
+        return removed
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+_default_cache: Optional[ParsedTextCache] = None
+
+
+def get_parse_cache() -> Optional[ParsedTextCache]:
+    """Shared cache configured from PARSE_CACHE_DIR (default <UPLOAD_BASE>/.parse_cache, empty
+    disables it) and PARSE_CACHE_MAX_BYTES"""
+    global _default_cache
+    cache_dir = os.getenv("PARSE_CACHE_DIR", os.path.join(os.getenv("UPLOAD_BASE", "data"), ".parse_cache"))
+    if not cache_dir:
+        return None
+    if _default_cache is None:
+        _default_cache = ParsedTextCache(cache_dir, int(os.getenv("PARSE_CACHE_MAX_BYTES", str(512 * 1024 * 1024))))
+    return _default_cache
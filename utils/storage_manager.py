@@ -0,0 +1,266 @@
+from __future__ import annotations
+import os
+import time
+import fcntl
+import shutil
+import asyncio
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Any
+from logger import global_logger as log
+from utils.index_cache import index_cache
+from utils.index_store import IndexSnapshotStore, IndexBusyError, flocked
+
+
+@dataclass
+class SessionUsage:
+    session_id: str
+    last_access: float
+    bytes: int
+
+
+def _tree_bytes(path: Path) -> int:
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(Path(entry.path))
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except FileNotFoundError:
+                        continue
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    return total
+
+
+class SessionStorageManager:
+    """Lifecycle of per-session storage: data/<session> (raw uploads) and faiss_index/<session>.
+
+    Last access is kept as the mtime of a marker file in the session's index directory, so it is
+    shared by all uvicorn workers without extra coordination. A sweep evicts sessions idle for
+    longer than ttl_seconds, then least recently used sessions until the total is under max_bytes.
+    Sessions touched within min_idle_seconds are never evicted, and neither are sessions with an
+    ingestion in progress: uploads hold a shared flock on faiss_index/.locks/<session>.ingest.lock
+    for their whole duration (see ingesting()), which eviction must take exclusively. Lock files,
+    the index write lock included, live outside the session directories so that eviction never
+    deletes a lock someone holds. Each sweep then removes the lock files of sessions that no
+    longer exist (prune_locks()); lockers re-check the file after flock() (see flocked()), so
+    removing one is safe.
+    """
+    ACCESS_MARKER = ".last_access"
+    LOCK_SUFFIXES = (".ingest.lock", ".write.lock")
+    LOCK_DIR = IndexSnapshotStore.LOCK_DIR
+
+    def __init__(self, upload_base: str = "data", faiss_base: str = "faiss_index",
+                 ttl_seconds: float = 0, max_bytes: int = 0, min_idle_seconds: float = 300,
+                 delete_uploads_after_index: bool = False):
+        self.upload_base = Path(upload_base)
+        self.faiss_base = Path(faiss_base)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.min_idle_seconds = min_idle_seconds
+        self.delete_uploads_after_index = delete_uploads_after_index
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Any] = {
+            "sweeps": 0, "last_sweep_at": None, "last_sweep_ms": None,
+            "sessions": 0, "total_bytes": 0,
+            "evicted_ttl": 0, "evicted_quota": 0, "bytes_freed": 0, "uploads_deleted": 0,
+            "skipped_busy": 0, "locks_removed": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.ttl_seconds or self.max_bytes)
+
+    # ------------------------------ access ------------------------------ #
+    def touch(self, session_id: Optional[str]) -> None:
+        """Record an access to session_id (called on index and query)"""
+        if not session_id:
+            return
+        d = self.faiss_base / session_id
+        if not d.is_dir():
+            return
+        marker = d / self.ACCESS_MARKER
+        try:
+            marker.touch(exist_ok=True)
+            os.utime(marker, None)
+        except OSError as e:
+            log.warning("Failed to record session access", session_id=session_id, error=str(e))
+
+    def _ingest_lock_path(self, session_id: str) -> Path:
+        d = self.faiss_base / self.LOCK_DIR
+        d.mkdir(parents=True, exist_ok=True)
+        return d / f"{session_id}.ingest.lock"
+
+    @contextmanager
+    def ingesting(self, session_id: str) -> Iterator[None]:
+        """Hold for the whole upload (save, parse, embed, index) so evict() leaves the session alone.
+        Shared, so concurrent uploads to one session do not wait for each other; waits only for
+        an eviction of the session that is already running."""
+        with flocked(self._ingest_lock_path(session_id), fcntl.LOCK_SH):
+            yield
+
+    def last_access(self, session_id: str) -> float:
+        candidates = [self.faiss_base / session_id / self.ACCESS_MARKER,
+                      self.faiss_base / session_id, self.upload_base / session_id]
+        for p in candidates:
+            try:
+                return p.stat().st_mtime
+            except FileNotFoundError:
+                continue
+        return 0.0
+
+    def discard_uploads(self, paths: Iterable[Path]) -> int:
+        """Delete raw uploads once their chunks are committed to the index"""
+        removed = 0
+        for p in paths:
+            try:
+                Path(p).unlink()
+                removed += 1
+            except FileNotFoundError:
+                continue
+        with self._lock:
+            self._metrics["uploads_deleted"] += removed
+        log.info("Raw uploads deleted after indexing", count=removed)
+        return removed
+
+    # ------------------------------ sweep ------------------------------ #
+    def _session_ids(self) -> List[str]:
+        ids = set()
+        for base in (self.faiss_base, self.upload_base):
+            try:
+                with os.scandir(base) as it:
+                    ids.update(e.name for e in it if e.is_dir(follow_symlinks=False) and not e.name.startswith("."))
+            except FileNotFoundError:
+                continue
+        if (self.faiss_base / IndexSnapshotStore.CURRENT_FILE).exists():
+            # faiss_base is itself an index (use_session_dirs=False): its snapshots are not a session
+            ids.discard(IndexSnapshotStore.VERSIONS_DIR)
+        return sorted(ids)
+
+    def usage(self) -> List[SessionUsage]:
+        return [
+            SessionUsage(sid, self.last_access(sid),
+                         _tree_bytes(self.faiss_base / sid) + _tree_bytes(self.upload_base / sid))
+            for sid in self._session_ids()
+        ]
+
+    def evict(self, session_id: str) -> Optional[int]:
+        """Delete a session's uploads and index; returns bytes freed, None if the session is being
+        ingested or a writer holds the index"""
+        freed = 0
+        try:
+            with flocked(self._ingest_lock_path(session_id), fcntl.LOCK_EX | fcntl.LOCK_NB), \
+                    IndexSnapshotStore(self.faiss_base / session_id).write_lock(blocking=False):
+                for base in (self.faiss_base, self.upload_base):
+                    d = base / session_id
+                    if d.is_dir():
+                        freed += _tree_bytes(d)
+                        shutil.rmtree(d, ignore_errors=True)
+        except (BlockingIOError, IndexBusyError):
+            return self._busy(session_id)
+        index_cache.invalidate(str(self.faiss_base / session_id))
+        return freed
+
+    def _busy(self, session_id: str) -> None:
+        log.info("Eviction skipped, session is being ingested or written", session_id=session_id)
+        with self._lock:
+            self._metrics["skipped_busy"] += 1
+        return None
+
+    def _exists(self, session_id: str) -> bool:
+        return (self.faiss_base / session_id).exists() or (self.upload_base / session_id).exists()
+
+    def prune_locks(self) -> int:
+        """Delete the lock files of sessions that no longer exist; returns files removed"""
+        try:
+            with os.scandir(self.faiss_base / self.LOCK_DIR) as it:
+                paths = [Path(e.path) for e in it if e.is_file(follow_symlinks=False)]
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for p in paths:
+            session_id = next((p.name[:-len(s)] for s in self.LOCK_SUFFIXES if p.name.endswith(s)), None)
+            if not session_id or self._exists(session_id):
+                continue
+            try:
+                with flocked(p, fcntl.LOCK_EX | fcntl.LOCK_NB):
+                    if not self._exists(session_id):  # not recreated while we waited for the lock
+                        p.unlink(missing_ok=True)
+                        removed += 1
+            except BlockingIOError:
+                continue  # in use: an upload about to create the session
+        with self._lock:
+            self._metrics["locks_removed"] += removed
+        return removed
+
+    def sweep(self, now: Optional[float] = None) -> Dict[str, List[str]]:
+        """One eviction pass; returns the evicted session ids by reason"""
+        t0 = time.perf_counter()
+        now = time.time() if now is None else now
+        sessions = sorted(self.usage(), key=lambda s: s.last_access)  # least recently used first
+        evicted: Dict[str, List[str]] = {"ttl": [], "quota": []}
+        freed = 0
+
+        def evictable(s: SessionUsage) -> bool:
+            return now - s.last_access >= self.min_idle_seconds
+
+        kept: List[SessionUsage] = []
+        for s in sessions:
+            if self.ttl_seconds and now - s.last_access > self.ttl_seconds and evictable(s):
+                n = self.evict(s.session_id)
+                if n is not None:
+                    freed += n
+                    evicted["ttl"].append(s.session_id)
+                    continue
+            kept.append(s)
+
+        total = sum(s.bytes for s in kept)
+        if self.max_bytes and total > self.max_bytes:
+            for s in list(kept):
+                if total <= self.max_bytes:
+                    break
+                if not evictable(s):
+                    continue
+                n = self.evict(s.session_id)
+                if n is None:
+                    continue
+                freed += n
+                total -= s.bytes
+                kept.remove(s)
+                evicted["quota"].append(s.session_id)
+
+        self.prune_locks()
+        with self._lock:
+            m = self._metrics
+            m["sweeps"] += 1
+            m["last_sweep_at"] = now
+            m["last_sweep_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            m["sessions"] = len(kept)
+            m["total_bytes"] = total
+            m["evicted_ttl"] += len(evicted["ttl"])
+            m["evicted_quota"] += len(evicted["quota"])
+            m["bytes_freed"] += freed
+        if evicted["ttl"] or evicted["quota"]:
+            log.info("Session storage swept", evicted_ttl=evicted["ttl"], evicted_quota=evicted["quota"], bytes_freed=freed)
+        return evicted
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._metrics, ttl_seconds=self.ttl_seconds, max_bytes=self.max_bytes)
+
+    async def run(self, interval_seconds: float) -> None:
+        """Background loop started from the API lifespan"""
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                log.warning("Session storage sweep failed", error=str(e))
+            await asyncio.sleep(interval_seconds)
@@ -0,0 +1,191 @@
+from __future__ import annotations
+import os
+import json
+import inspect
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# codec -> faiss ScalarQuantizer type name ("flat" keeps the default float32 IndexFlat)
+CODECS = {"flat": None, "fp16": "QT_fp16", "int8": "QT_8bit"}
+
+
+@dataclass
+class VectorFormat:
+    """How a session index stores its vectors (recorded in ingested_meta.json under "vector_format").
+
+    codec:      flat (float32) | fp16 | int8 scalar quantization
+    dim:        reduced output dimension, None keeps the model's full dimension
+    dim_mode:   "request" asks the embedding API for `dim` (falls back to truncate), "truncate"
+                cuts the full vector; both L2-renormalize
+    rescore:    keep float32 vectors on disk (memory-mapped at query time) and re-rank a
+                shortlist of k * oversample quantized hits with them
+    min_train:  int8 only: the index stays float32 until it holds this many vectors, then the
+                int8 ranges are trained on all of them (ranges fit to a first small upload
+                would clip the chunks added later)
+    """
+    codec: str = "flat"
+    dim: Optional[int] = None
+    dim_mode: str = "request"
+    rescore: bool = False
+    oversample: int = 4
+    min_train: int = 1000
+
+    def __post_init__(self):
+        if self.codec not in CODECS:
+            raise ValueError(f"Unsupported vector codec: {self.codec} (expected one of {list(CODECS)})")
+        if self.dim_mode not in ("request", "truncate"):
+            raise ValueError(f"Unsupported dim_mode: {self.dim_mode}")
+
+    @property
+    def is_default(self) -> bool:
+        return self.codec == "flat" and not self.dim and not self.rescore
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: Optional[Dict[str, Any]]) -> "VectorFormat":
+        d = d or {}
+        return cls(**{k: v for k, v in d.items() if k in cls.__dataclass_fields__ and v is not None})
+
+
+def read_vector_format(index_dir: Path) -> VectorFormat:
+    """VectorFormat recorded in an index directory's manifest (flat float32 when absent)"""
+    try:
+        meta = json.loads((Path(index_dir) / "ingested_meta.json").read_text(encoding="utf-8") or "{}")
+    except (FileNotFoundError, ValueError):
+        meta = {}
+    return VectorFormat.from_dict(meta.get("vector_format"))
+
+
+def _l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def truncate_vectors(vectors: np.ndarray, dim: int) -> np.ndarray:
+    return _l2_normalize(np.asarray(vectors, dtype=np.float32)[:, :dim])
+
+
+class ReducedEmbeddings(Embeddings):
+    """Embeddings wrapper producing `dim`-dimensional, L2-normalized vectors"""
+    def __init__(self, base: Embeddings, dim: int, mode: str = "request"):
+        self.base = base
+        self.dim = dim
+        self._native = mode == "request" and "output_dimensionality" in inspect.signature(base.embed_documents).parameters
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        if self._native:
+            kwargs["output_dimensionality"] = self.dim
+        return truncate_vectors(np.asarray(self.base.embed_documents(texts, **kwargs)), self.dim).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        kwargs = {"output_dimensionality": self.dim} if self._native else {}
+        return truncate_vectors(np.asarray([self.base.embed_query(text, **kwargs)]), self.dim)[0].tolist()
+
+
+def wrap_embeddings(embeddings: Embeddings, fmt: VectorFormat) -> Embeddings:
+    return ReducedEmbeddings(embeddings, fmt.dim, fmt.dim_mode) if fmt.dim else embeddings
+
+
+def quantize_index(index, codec: str, min_train: int = 0):
+    """Copy a float32 FAISS index into a scalar-quantized one (int8 ranges are trained on its vectors).
+
+    Returns the index unchanged when it is already quantized, or for int8 while it holds fewer
+    than min_train vectors.
+    """
+    import faiss
+
+    qtype = CODECS[codec]
+    if qtype is None or isinstance(index, faiss.IndexScalarQuantizer):
+        return index
+    if codec == "int8" and index.ntotal < min_train:
+        return index
+    vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), dtype=np.float32)
+    sq = faiss.IndexScalarQuantizer(index.d, getattr(faiss.ScalarQuantizer, qtype), index.metric_type)
+    if vectors.shape[0]:
+        sq.train(vectors)
+        sq.add(vectors)
+    return sq
+
+
+class FullVectorStore:
+    """float32 copy of every vector keyed by docstore id, kept beside the index for rescoring.
+
+    Readers open it memory-mapped, so only the rows of a shortlist are paged in.
+    """
+    VECTORS_FILE = "vectors.f32.npy"
+    IDS_FILE = "vectors.ids.json"
+
+    def __init__(self, ids: Sequence[str], vectors: np.ndarray):
+        self.ids: List[str] = list(ids)
+        self.vectors = vectors
+        self._pos = {doc_id: i for i, doc_id in enumerate(self.ids)}
+
+    @classmethod
+    def empty(cls, dim: int) -> "FullVectorStore":
+        return cls([], np.zeros((0, dim), dtype=np.float32))
+
+    @classmethod
+    def load(cls, index_dir: Path, mmap: bool = True) -> Optional["FullVectorStore"]:
+        index_dir = Path(index_dir)
+        try:
+            ids = json.loads((index_dir / cls.IDS_FILE).read_text(encoding="utf-8"))
+            vectors = np.load(index_dir / cls.VECTORS_FILE, mmap_mode="r" if mmap else None)
+        except FileNotFoundError:
+            return None
+        return cls(ids, vectors)
+
+    def save(self, index_dir: Path) -> None:
+        # Written aside and renamed: a reader's memory map keeps the old file alive instead of
+        # seeing it truncated under it
+        index_dir = Path(index_dir)
+        tmp = index_dir / f".{self.VECTORS_FILE}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.asarray(self.vectors, dtype=np.float32))
+        os.replace(tmp, index_dir / self.VECTORS_FILE)
+        tmp = index_dir / f".{self.IDS_FILE}.tmp"
+        tmp.write_text(json.dumps(self.ids), encoding="utf-8")
+        os.replace(tmp, index_dir / self.IDS_FILE)
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        self.vectors = np.concatenate([np.asarray(self.vectors), vectors]) if len(self.ids) else vectors
+        for doc_id in ids:
+            self._pos[doc_id] = len(self.ids)
+            self.ids.append(doc_id)
+
+    def remove(self, ids: Sequence[str]) -> None:
+        gone = set(ids)
+        keep = [i for i, doc_id in enumerate(self.ids) if doc_id not in gone]
+        self.vectors = np.asarray(self.vectors)[keep]
+        self.ids = [self.ids[i] for i in keep]
+        self._pos = {doc_id: i for i, doc_id in enumerate(self.ids)}
+
+    def get(self, ids: Sequence[str]) -> np.ndarray:
+        return np.asarray(self.vectors[[self._pos[doc_id] for doc_id in ids]], dtype=np.float32)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._pos
+
+
+def exact_scores(query: np.ndarray, vectors: np.ndarray, metric_type: int) -> np.ndarray:
+    """Full-precision scores in the index's convention (L2: squared distance, smaller is better)"""
+    import faiss
+
+    if metric_type == faiss.METRIC_INNER_PRODUCT:
+        return vectors @ query
+    diff = vectors - query
+    return np.einsum("ij,ij->i", diff, diff)
+
+
+def rescore_order(scores: np.ndarray, metric_type: int, k: int) -> np.ndarray:
+    import faiss
+
+    order = np.argsort(-scores if metric_type == faiss.METRIC_INNER_PRODUCT else scores, kind="stable")
+    return order[:k]
+